@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Offline benchmark of the Storm exporter against a local fake Storm UI.
+
+The fake Storm UI serves synthetic (or recorded) REST payloads for N topologies
+with M components each, with configurable latency and error injection. It runs
+in a separate process so the CPU and memory figures only cover the exporter.
+
+    python benchmark_storm_exporter.py --topologies 150 --spouts 2 --bolts 20 --latency-ms 20 --rounds 5
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import threading
+import time
+import requests
+import storm_exporter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+
+WINDOWS = ('600', '10800', '86400', ':all-time')
+ERROR_KINDS = ('http', 'content_type', 'truncated', 'timeout')
+
+
+def window_stats(seed):
+    return [{
+        'window': window,
+        'emitted': seed * 1000 * (i + 1),
+        'transferred': seed * 1000 * (i + 1),
+        'completeLatency': '12.345',
+        'acked': seed * 900 * (i + 1),
+        'failed': seed * (i + 1),
+    } for i, window in enumerate(WINDOWS)]
+
+
+def synthetic_payloads(topologies, spouts, bolts, executors, config_keys):
+    """Build the Storm UI responses of a synthetic cluster, keyed by request path."""
+    payloads = {}
+    summaries = []
+
+    for t in range(topologies):
+        topology_name = f'topology-{t}'
+        topology_id = f'{topology_name}-1-1700000000'
+        spout_ids = [f'spout-{s}' for s in range(spouts)]
+        bolt_ids = [f'bolt-{b}' for b in range(bolts)]
+        components = len(spout_ids) + len(bolt_ids)
+
+        summaries.append({
+            'id': topology_id, 'encodedId': topology_id, 'name': topology_name, 'status': 'ACTIVE',
+            'uptimeSeconds': 3600 + t, 'tasksTotal': components * executors, 'workersTotal': 4,
+            'executorsTotal': components * executors, 'replicationCount': 1,
+            'requestedMemOnHeap': 1024, 'requestedMemOffHeap': 0, 'requestedTotalMem': 1024, 'requestedCpu': 400,
+            'assignedMemOnHeap': 1024, 'assignedMemOffHeap': 0, 'assignedTotalMem': 1024, 'assignedCpu': 400,
+        })
+        payloads[f'/api/v1/topology/{topology_id}'] = {
+            'id': topology_id, 'name': topology_name, 'status': 'ACTIVE',
+            'topologyStats': window_stats(t + 1),
+            'spouts': [{'spoutId': spout_id, 'executors': executors, 'tasks': executors, 'emitted': 1000,
+                        'transferred': 1000, 'completeLatency': '10.000', 'acked': 900, 'failed': 1}
+                       for spout_id in spout_ids],
+            'bolts': [{'boltId': bolt_id, 'executors': executors, 'tasks': executors, 'emitted': 1000,
+                       'transferred': 1000, 'capacity': '0.100', 'executeLatency': '0.500',
+                       'processLatency': '0.600', 'acked': 900, 'failed': 1}
+                      for bolt_id in bolt_ids],
+            # Storm UI also returns the full topology configuration, which the exporter ignores
+            'configuration': {f'topology.synthetic.option.{k}': 'x' * 64 for k in range(config_keys)},
+        }
+
+        for component_id in spout_ids + bolt_ids:
+            is_bolt = component_id.startswith('bolt')
+            executor_stats = []
+            for e in range(executors):
+                executor = {'id': f'[{e + 1}-{e + 1}]', 'host': f'worker-{e % 4}', 'port': 6700 + e % 4,
+                            'uptimeSeconds': 3600, 'emitted': 100, 'transferred': 100, 'acked': 90, 'failed': 1}
+                if is_bolt:
+                    executor.update({'capacity': '0.100', 'executeLatency': '0.500', 'processLatency': '0.600'})
+                else:
+                    executor['completeLatency'] = '10.000'
+                executor_stats.append(executor)
+            payloads[f'/api/v1/topology/{topology_id}/component/{component_id}'] = {
+                'id': component_id,
+                'executorStats': executor_stats,
+                'outputStats': [{'stream': 'default', 'emitted': 1000, 'transferred': 1000}],
+            }
+
+    payloads['/api/v1/topology/summary'] = {'topologies': summaries}
+    payloads['/api/v1/supervisor/summary'] = {'supervisors': [
+        {'id': f'supervisor-{s}', 'host': f'worker-{s}', 'uptimeSeconds': 86400, 'slotsTotal': 4, 'slotsUsed': 4,
+         'totalMem': 16384, 'usedMem': 8192, 'totalCpu': 800, 'usedCpu': 400}
+        for s in range(4)]}
+    return payloads
+
+
+def recorded_payloads(payload_dir):
+    """Load recorded responses laid out like the REST paths, e.g. api/v1/topology/summary.json."""
+    payloads = {}
+    for root, _, files in os.walk(payload_dir):
+        for file_name in files:
+            if not file_name.endswith('.json'):
+                continue
+            path = os.path.join(root, file_name)
+            with open(path) as f:
+                payloads['/' + os.path.relpath(path, payload_dir)[:-len('.json')].replace(os.sep, '/')] = json.load(f)
+    return payloads
+
+
+class FakeStormUIHandler(BaseHTTPRequestHandler):
+    """Serve pre-encoded Storm UI payloads with injected latency and errors."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        path = unquote(self.path.split('?', 1)[0])
+        encoded = server.payloads.get(path)
+        if encoded is None:
+            self.send_error(404)
+            return
+
+        time.sleep(server.latency + server.random_uniform(0, server.jitter))
+        body, gzip_body = encoded
+        content_type = 'application/json'
+
+        # The summary is never broken, otherwise every cycle would fail as a whole
+        error = server.pick_error() if path != '/api/v1/topology/summary' else None
+        if error == 'http':
+            self.send_error(500)
+            return
+        if error == 'timeout':
+            time.sleep(server.timeout)
+        elif error == 'content_type':
+            content_type = 'text/html'
+        elif error == 'truncated':
+            body, gzip_body = body[:len(body) // 2], None
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        if gzip_body is not None and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip_body
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeStormUI(ThreadingHTTPServer):
+    """Local stand-in for the Storm UI REST API."""
+
+    daemon_threads = True
+
+    def __init__(self, payloads, latency=0, jitter=0, error_rate=0, error_kinds=('http',), timeout=10, seed=0, addr=('127.0.0.1', 0)):
+        super().__init__(addr, FakeStormUIHandler)
+        self.payloads = {}
+        for path, payload in payloads.items():
+            body = json.dumps(payload).encode()
+            self.payloads[path] = (body, gzip.compress(body))
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_kinds = tuple(error_kinds)
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+
+    @property
+    def storm_ui_host(self):
+        return f'{self.server_address[0]}:{self.server_port}'
+
+    def random_uniform(self, low, high):
+        with self.random_lock:
+            return self.random.uniform(low, high)
+
+    def pick_error(self):
+        with self.random_lock:
+            if self.error_rate <= 0 or self.random.random() >= self.error_rate:
+                return None
+            return self.random.choice(self.error_kinds)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def handle_error(self, request, client_address):
+        # The exporter drops connections of responses it gave up on, that is expected here
+        pass
+
+
+def serve_fake_storm_ui(options, ready):
+    """Entry point of the fake Storm UI process."""
+    if options['payload_dir']:
+        payloads = recorded_payloads(options['payload_dir'])
+    else:
+        payloads = synthetic_payloads(options['topologies'], options['spouts'], options['bolts'], options['executors'], options['config_keys'])
+    server = FakeStormUI(payloads, options['latency'], options['jitter'], options['error_rate'], options['error_kinds'], options['timeout'], options['seed'])
+    ready.put(server.storm_ui_host)
+    server.serve_forever()
+
+
+def timed(function, *args):
+    wall, cpu = time.perf_counter(), time.process_time()
+    function(*args)
+    return time.perf_counter() - wall, time.process_time() - cpu
+
+
+def summarize(values):
+    return {'min': min(values), 'median': statistics.median(values), 'max': max(values)}
+
+
+def count_series():
+    collectors = (storm_exporter.STORM_COLLECTOR, storm_exporter.COMPONENT_COLLECTOR)
+    return sum(len(family.samples) for collector in collectors for family in collector.collect())
+
+
+def run_benchmark(storm_ui_host, args):
+    storm_exporter.configure_http_session(args.max_concurrent_requests * 2, args.connect_timeout, args.read_timeout)
+    storm_exporter.configure_adaptive_polling(args.idle_refresh_rate, 0.8)
+    summary = requests.get(f'http://{storm_ui_host}/api/v1/topology/summary').json()
+    topology_names = {topology['name'] for topology in summary['topologies']}
+    results = {}
+
+    # Full refresh cycles, the warmup rounds open the pooled connections
+    tiers = [('topologies', storm_exporter.collect_all_topologies_metrics, (storm_ui_host, args.max_concurrent_requests, 3))]
+    if args.component_tier:
+        tiers.append(('components', storm_exporter.collect_all_components_metrics, (storm_ui_host, topology_names, args.max_concurrent_requests, 3)))
+    for tier, function, function_args in tiers:
+        for _ in range(args.warmup):
+            function(*function_args)
+        timings = [timed(function, *function_args) for _ in range(args.rounds)]
+        results[f'{tier}_cycle_wall_seconds'] = summarize([wall for wall, _ in timings])
+        results[f'{tier}_cycle_cpu_seconds'] = summarize([cpu for _, cpu in timings])
+
+    # Rendering the exposition happens once per cycle
+    results['render_seconds'] = summarize([timed(storm_exporter.METRICS_CACHE.refresh)[0] for _ in range(args.rounds)])
+
+    # Scrapes only serve the cached exposition
+    server = storm_exporter.start_metrics_server(0, addr='127.0.0.1')
+    url = f'http://127.0.0.1:{server.server_port}/metrics'
+    with requests.Session() as session:
+        for encoding in ('identity', 'gzip'):
+            latencies = []
+            for _ in range(args.scrapes):
+                start = time.perf_counter()
+                response = session.get(url, headers={'Accept-Encoding': encoding})
+                latencies.append(time.perf_counter() - start)
+            results[f'scrape_{encoding}_seconds'] = summarize(latencies)
+            results[f'scrape_{encoding}_bytes'] = int(response.headers['Content-Length'])
+    server.shutdown()
+
+    results['series'] = count_series()
+    results['peak_rss_mib'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return results
+
+
+def print_results(workload, results):
+    print(f"Workload: {workload['topologies']} topologies x {workload['spouts'] + workload['bolts']} components, "
+          f"{workload['executors']} executors each, latency {workload['latency_ms']}ms +{workload['jitter_ms']}ms, "
+          f"error rate {workload['error_rate']:.1%}")
+    for name, value in results.items():
+        if isinstance(value, dict):
+            print(f"  {name:<34} min {value['min']:.6f}  median {value['median']:.6f}  max {value['max']:.6f}")
+        else:
+            print(f"  {name:<34} {value:.1f}" if isinstance(value, float) else f"  {name:<34} {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Storm exporter benchmark against a local fake Storm UI')
+
+    parser.add_argument('--topologies', type=int, default=50, help='Number of synthetic topologies')
+    parser.add_argument('--spouts', type=int, default=2, help='Number of spouts per topology')
+    parser.add_argument('--bolts', type=int, default=10, help='Number of bolts per topology')
+    parser.add_argument('--executors', type=int, default=4, help='Number of executors per component')
+    parser.add_argument('--config-keys', type=int, default=200, help='Number of configuration entries per topology detail payload')
+    parser.add_argument('--payload-dir', help='Directory with recorded payloads (api/v1/topology/summary.json, ...) instead of synthetic ones')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Fake Storm UI response latency in milliseconds')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Random extra latency in milliseconds')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of detail and component requests answered with an error')
+    parser.add_argument('--error-kinds', default='http,content_type,truncated', help=f"Comma separated injected errors out of {', '.join(ERROR_KINDS)}")
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the error injection')
+    parser.add_argument('--rounds', type=int, default=5, help='Number of measured refresh cycles')
+    parser.add_argument('--warmup', type=int, default=1, help='Number of refresh cycles run before measuring')
+    parser.add_argument('--scrapes', type=int, default=100, help='Number of measured /metrics scrapes per encoding')
+    parser.add_argument('--max-concurrent-requests', type=int, default=4, help='Maximum number of topology details fetched in parallel')
+    parser.add_argument('--idle-refresh-rate', type=int, default=0, help='Refresh rate of idle topologies in seconds (0 disables adaptive polling)')
+    parser.add_argument('--connect-timeout', type=float, default=5, help='Storm UI connect timeout in seconds')
+    parser.add_argument('--read-timeout', type=float, default=5, help='Storm UI read timeout in seconds')
+    parser.add_argument('--component-tier', action='store_true', help='Also benchmark the per-executor component tier')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON, e.g. to compare releases')
+    parser.add_argument('--log-level', default='CRITICAL', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], help='Exporter logging level')
+
+    args = parser.parse_args()
+
+    error_kinds = [kind for kind in args.error_kinds.split(',') if kind]
+    unknown = set(error_kinds) - set(ERROR_KINDS)
+    if unknown:
+        parser.error(f"Unknown error kinds: {', '.join(sorted(unknown))}")
+
+    logging.basicConfig(level=getattr(logging, args.log_level), format='%(asctime)s - %(levelname)s - %(message)s')
+
+    workload = {
+        'topologies': args.topologies, 'spouts': args.spouts, 'bolts': args.bolts, 'executors': args.executors,
+        'config_keys': args.config_keys, 'payload_dir': args.payload_dir, 'latency_ms': args.latency_ms,
+        'jitter_ms': args.jitter_ms, 'error_rate': args.error_rate, 'error_kinds': error_kinds, 'seed': args.seed,
+    }
+    options = dict(workload, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, timeout=args.read_timeout + 1)
+
+    # The fake Storm UI lives in its own process so it does not skew CPU and RSS figures
+    ready = multiprocessing.Queue()
+    fake_storm_ui = multiprocessing.Process(target=serve_fake_storm_ui, args=(options, ready), daemon=True)
+    fake_storm_ui.start()
+    try:
+        storm_ui_host = ready.get(timeout=60)
+        results = run_benchmark(storm_ui_host, args)
+    finally:
+        fake_storm_ui.terminate()
+
+    if args.json:
+        print(json.dumps({'workload': workload, 'results': results}, indent=2))
+    else:
+        print_results(workload, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,53 +2,712 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import gzip
+import hashlib
+import ijson
+import json
 import os
 import logging
+import re
 import requests
-from apscheduler.schedulers.blocking import BlockingScheduler
-from prometheus_client import start_http_server, Gauge
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from requests.utils import quote
+from urllib3.exceptions import ReadTimeoutError
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from prometheus_client import generate_latest, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
 
 
+# Shared keep-alive HTTP session used for every Storm UI request
+HTTP_SESSION = requests.Session()
+HTTP_TIMEOUT = (5, 5)  # (connect, read) timeouts in seconds
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Storm UI endpoints, used as the endpoint label of the exporter's own metrics
+TOPOLOGY_SUMMARY_ENDPOINT = '/api/v1/topology/summary'
+TOPOLOGY_DETAILS_ENDPOINT = '/api/v1/topology/{id}'
+COMPONENT_ENDPOINT = '/api/v1/topology/{id}/component/{component}'
+SUPERVISOR_SUMMARY_ENDPOINT = '/api/v1/supervisor/summary'
+
+# Top-level members of /api/v1/topology/{id} used by the exporter, everything else is skipped while parsing
+TOPOLOGY_DETAIL_FIELDS = ('id', 'name', 'status', 'topologyStats', 'spouts', 'bolts')
+
+# Definition of an exported metric family, rendered from the current snapshot on scrape
+Metric = namedtuple('Metric', ['name', 'documentation', 'labelnames', 'kind'], defaults=['gauge'])
+
+# Storm window holding the cumulative values counters are derived from
+ALL_TIME_WINDOW = ':all-time'
+
 # TOPOLOGY/SUMMARY METRICS
-STORM_TOPOLOGY_UPTIME_SECONDS = Gauge('storm_topology_uptime_seconds','Shows how long the topology is running in seconds',['topology_name', 'topology_id'])
-STORM_TOPOLOGY_TASKS_TOTAL = Gauge('storm_topology_tasks_total','Total number of tasks for this topology',['topology_name', 'topology_id'])
-STORM_TOPOLOGY_WORKERS_TOTAL = Gauge('storm_topology_workers_total','Number of workers used for this topology',['topology_name', 'topology_id'])
-STORM_TOPOLOGY_EXECUTORS_TOTAL = Gauge('storm_topology_executors_total','Number of executors used for this topology',['topology_name', 'topology_id'])
-STORM_TOPOLOGY_REPLICATION_COUNT = Gauge('storm_topology_replication_count','Number of nimbus hosts on which this topology code is replicated',['topology_name', 'topology_id'])
-STORM_TOPOLOGY_REQUESTED_MEM_ON_HEAP = Gauge('storm_topology_requested_mem_on_heap','Requested On-Heap Memory by User (MB)',['topology_name', 'topology_id'])
-STORM_TOPOLOGY_REQUESTED_MEM_OFF_HEAP = Gauge('storm_topology_requested_mem_off_heap','Requested Off-Heap Memory by User (MB)',['topology_name', 'topology_id'])
-STORM_TOPOLOGY_REQUESTED_TOTAL_MEM = Gauge('storm_topology_requested_total_mem','Requested Total Memory by User (MB)',['topology_name', 'topology_id'])
-STORM_TOPOLOGY_REQUESTED_CPU = Gauge('storm_topology_requested_cpu','Requested CPU by User (%)',['topology_name', 'topology_id'])
-STORM_TOPOLOGY_ASSIGNED_MEM_ON_HEAP = Gauge('storm_topology_assigned_mem_on_heap','Assigned On-Heap Memory by Scheduler (MB)',['topology_name', 'topology_id'])
-STORM_TOPOLOGY_ASSIGNED_MEM_OFF_HEAP = Gauge('storm_topology_assigned_mem_off_heap','Assigned Off-Heap Memory by Scheduler (MB)',['topology_name', 'topology_id'])
-STORM_TOPOLOGY_ASSIGNED_TOTAL_MEM = Gauge('storm_topology_assigned_total_mem','Assigned Total Memory by Scheduler (MB)',['topology_name', 'topology_id'])
-STORM_TOPOLOGY_ASSIGNED_CPU = Gauge('storm_topology_assigned_cpu','Assigned CPU by Scheduler (%)',['topology_name', 'topology_id'])
+STORM_TOPOLOGY_UPTIME_SECONDS = Metric('storm_topology_uptime_seconds','Shows how long the topology is running in seconds',['topology_name', 'topology_id'])
+STORM_TOPOLOGY_TASKS_TOTAL = Metric('storm_topology_tasks_total','Total number of tasks for this topology',['topology_name', 'topology_id'])
+STORM_TOPOLOGY_WORKERS_TOTAL = Metric('storm_topology_workers_total','Number of workers used for this topology',['topology_name', 'topology_id'])
+STORM_TOPOLOGY_EXECUTORS_TOTAL = Metric('storm_topology_executors_total','Number of executors used for this topology',['topology_name', 'topology_id'])
+STORM_TOPOLOGY_REPLICATION_COUNT = Metric('storm_topology_replication_count','Number of nimbus hosts on which this topology code is replicated',['topology_name', 'topology_id'])
+STORM_TOPOLOGY_REQUESTED_MEM_ON_HEAP = Metric('storm_topology_requested_mem_on_heap','Requested On-Heap Memory by User (MB)',['topology_name', 'topology_id'])
+STORM_TOPOLOGY_REQUESTED_MEM_OFF_HEAP = Metric('storm_topology_requested_mem_off_heap','Requested Off-Heap Memory by User (MB)',['topology_name', 'topology_id'])
+STORM_TOPOLOGY_REQUESTED_TOTAL_MEM = Metric('storm_topology_requested_total_mem','Requested Total Memory by User (MB)',['topology_name', 'topology_id'])
+STORM_TOPOLOGY_REQUESTED_CPU = Metric('storm_topology_requested_cpu','Requested CPU by User (%)',['topology_name', 'topology_id'])
+STORM_TOPOLOGY_ASSIGNED_MEM_ON_HEAP = Metric('storm_topology_assigned_mem_on_heap','Assigned On-Heap Memory by Scheduler (MB)',['topology_name', 'topology_id'])
+STORM_TOPOLOGY_ASSIGNED_MEM_OFF_HEAP = Metric('storm_topology_assigned_mem_off_heap','Assigned Off-Heap Memory by Scheduler (MB)',['topology_name', 'topology_id'])
+STORM_TOPOLOGY_ASSIGNED_TOTAL_MEM = Metric('storm_topology_assigned_total_mem','Assigned Total Memory by Scheduler (MB)',['topology_name', 'topology_id'])
+STORM_TOPOLOGY_ASSIGNED_CPU = Metric('storm_topology_assigned_cpu','Assigned CPU by Scheduler (%)',['topology_name', 'topology_id'])
+STORM_TOPOLOGY_DATA_TIMESTAMP_SECONDS = Metric('storm_topology_data_timestamp_seconds','Unix time the oldest exported data of the topology was fetched from Storm UI, time() minus this is the data age',['topology_name', 'topology_id'])
 
 # TOPOLOGY/STATS METRICS:
-STORM_TOPOLOGY_STATS_TRANSFERRED = Gauge('storm_topology_stats_transferred','Number messages transferred in given window',['topology_name', 'topology_id','window'])
-STORM_TOPOLOGY_STATS_EMITTED = Gauge('storm_topology_stats_emitted','Number of messages emitted in given window',['topology_name', 'topology_id','window'])
-STORM_TOPOLOGY_STATS_COMPLETE_LATENCY = Gauge('storm_topology_stats_complete_latency','Total latency for processing the message',['topology_name', 'topology_id','window'])
-STORM_TOPOLOGY_STATS_ACKED = Gauge('storm_topology_stats_acked','Number of messages acked in given window',['topology_name', 'topology_id','window'])
-STORM_TOPOLOGY_STATS_FAILED = Gauge('storm_topology_stats_failed','Number of messages failed in given window',['topology_name', 'topology_id','window'])
+STORM_TOPOLOGY_STATS_TRANSFERRED = Metric('storm_topology_stats_transferred','Number messages transferred in given window',['topology_name', 'topology_id','window'])
+STORM_TOPOLOGY_STATS_EMITTED = Metric('storm_topology_stats_emitted','Number of messages emitted in given window',['topology_name', 'topology_id','window'])
+STORM_TOPOLOGY_STATS_COMPLETE_LATENCY = Metric('storm_topology_stats_complete_latency','Total latency for processing the message',['topology_name', 'topology_id','window'])
+STORM_TOPOLOGY_STATS_ACKED = Metric('storm_topology_stats_acked','Number of messages acked in given window',['topology_name', 'topology_id','window'])
+STORM_TOPOLOGY_STATS_FAILED = Metric('storm_topology_stats_failed','Number of messages failed in given window',['topology_name', 'topology_id','window'])
 
 # TOPOLOGY/ID SPOUT METRICS:
-STORM_TOPOLOGY_SPOUTS_EXECUTORS = Gauge('storm_topology_spouts_executors','Number of executors for the spout',['topology_name', 'topology_id', 'spout_id'])
-STORM_TOPOLOGY_SPOUTS_EMITTED = Gauge('storm_topology_spouts_emitted','Number of messages emitted in given window',['topology_name', 'topology_id', 'spout_id'])
-STORM_TOPOLOGY_SPOUTS_COMPLETE_LATENCY = Gauge('storm_topology_spouts_complete_latency','Total latency for processing the message',['topology_name', 'topology_id', 'spout_id'])
-STORM_TOPOLOGY_SPOUTS_TRANSFERRED = Gauge('storm_topology_spouts_transferred','Total number of messages transferred in given window',['topology_name', 'topology_id', 'spout_id'])
-STORM_TOPOLOGY_SPOUTS_TASKS = Gauge('storm_topology_spouts_tasks','Total number of tasks for the spout',['topology_name', 'topology_id', 'spout_id'])
-STORM_TOPOLOGY_SPOUTS_ACKED = Gauge('storm_topology_spouts_acked','Number of messages acked',['topology_name', 'topology_id', 'spout_id'])
-STORM_TOPOLOGY_SPOUTS_FAILED = Gauge('storm_topology_spouts_failed','Number of messages failed',['topology_name', 'topology_id', 'spout_id'])
+STORM_TOPOLOGY_SPOUTS_EXECUTORS = Metric('storm_topology_spouts_executors','Number of executors for the spout',['topology_name', 'topology_id', 'spout_id'])
+STORM_TOPOLOGY_SPOUTS_EMITTED = Metric('storm_topology_spouts_emitted','Number of messages emitted in given window',['topology_name', 'topology_id', 'spout_id'])
+STORM_TOPOLOGY_SPOUTS_COMPLETE_LATENCY = Metric('storm_topology_spouts_complete_latency','Total latency for processing the message',['topology_name', 'topology_id', 'spout_id'])
+STORM_TOPOLOGY_SPOUTS_TRANSFERRED = Metric('storm_topology_spouts_transferred','Total number of messages transferred in given window',['topology_name', 'topology_id', 'spout_id'])
+STORM_TOPOLOGY_SPOUTS_TASKS = Metric('storm_topology_spouts_tasks','Total number of tasks for the spout',['topology_name', 'topology_id', 'spout_id'])
+STORM_TOPOLOGY_SPOUTS_ACKED = Metric('storm_topology_spouts_acked','Number of messages acked',['topology_name', 'topology_id', 'spout_id'])
+STORM_TOPOLOGY_SPOUTS_FAILED = Metric('storm_topology_spouts_failed','Number of messages failed',['topology_name', 'topology_id', 'spout_id'])
 
 # TOPOLOGY/ID BOLT METRICS:
-STORM_TOPOLOGY_BOLTS_PROCESS_LATENCY = Gauge('storm_topology_bolts_process_latency','Average time of the bolt to ack a message after it was received',['topology_name', 'topology_id', 'bolt_id'])
-STORM_TOPOLOGY_BOLTS_CAPACITY = Gauge('storm_topology_bolts_capacity','This value indicates number of messages executed * average execute latency / time window',['topology_name', 'topology_id', 'bolt_id'])
-STORM_TOPOLOGY_BOLTS_EXECUTE_LATENCY = Gauge('storm_topology_bolts_execute_latency','Average time to run the execute method of the bolt',['topology_name', 'topology_id', 'bolt_id'])
-STORM_TOPOLOGY_BOLTS_EXECUTORS = Gauge('storm_topology_bolts_executors','Number of executor tasks in the bolt component',['topology_name', 'topology_id', 'bolt_id'])
-STORM_TOPOLOGY_BOLTS_TASKS = Gauge('storm_topology_bolts_tasks','Number of instances of bolt',['topology_name', 'topology_id', 'bolt_id'])
-STORM_TOPOLOGY_BOLTS_ACKED = Gauge('storm_topology_bolts_acked','Number of tuples acked by the bolt',['topology_name', 'topology_id', 'bolt_id'])
-STORM_TOPOLOGY_BOLTS_FAILED = Gauge('storm_topology_bolts_failed','Number of tuples failed by the bolt',['topology_name', 'topology_id', 'bolt_id'])
-STORM_TOPOLOGY_BOLTS_EMITTED = Gauge('storm_topology_bolts_emitted','of tuples emitted by the bolt',['topology_name', 'topology_id', 'bolt_id'])
+STORM_TOPOLOGY_BOLTS_PROCESS_LATENCY = Metric('storm_topology_bolts_process_latency','Average time of the bolt to ack a message after it was received',['topology_name', 'topology_id', 'bolt_id'])
+STORM_TOPOLOGY_BOLTS_CAPACITY = Metric('storm_topology_bolts_capacity','This value indicates number of messages executed * average execute latency / time window',['topology_name', 'topology_id', 'bolt_id'])
+STORM_TOPOLOGY_BOLTS_EXECUTE_LATENCY = Metric('storm_topology_bolts_execute_latency','Average time to run the execute method of the bolt',['topology_name', 'topology_id', 'bolt_id'])
+STORM_TOPOLOGY_BOLTS_EXECUTORS = Metric('storm_topology_bolts_executors','Number of executor tasks in the bolt component',['topology_name', 'topology_id', 'bolt_id'])
+STORM_TOPOLOGY_BOLTS_TASKS = Metric('storm_topology_bolts_tasks','Number of instances of bolt',['topology_name', 'topology_id', 'bolt_id'])
+STORM_TOPOLOGY_BOLTS_ACKED = Metric('storm_topology_bolts_acked','Number of tuples acked by the bolt',['topology_name', 'topology_id', 'bolt_id'])
+STORM_TOPOLOGY_BOLTS_FAILED = Metric('storm_topology_bolts_failed','Number of tuples failed by the bolt',['topology_name', 'topology_id', 'bolt_id'])
+STORM_TOPOLOGY_BOLTS_EMITTED = Metric('storm_topology_bolts_emitted','of tuples emitted by the bolt',['topology_name', 'topology_id', 'bolt_id'])
+
+# TOPOLOGY/ID/COMPONENT EXECUTOR METRICS (opt-in component tier):
+EXECUTOR_LABELS = ['topology_name', 'topology_id', 'component_id', 'executor_id', 'host', 'port']
+STORM_TOPOLOGY_COMPONENT_EXECUTOR_UPTIME_SECONDS = Metric('storm_topology_component_executor_uptime_seconds','Shows how long the executor is running in seconds',EXECUTOR_LABELS)
+STORM_TOPOLOGY_COMPONENT_EXECUTOR_CAPACITY = Metric('storm_topology_component_executor_capacity','Percentage of time the executor spent executing tuples in the last 10 minutes',EXECUTOR_LABELS)
+STORM_TOPOLOGY_COMPONENT_EXECUTOR_EXECUTE_LATENCY = Metric('storm_topology_component_executor_execute_latency','Average time to run the execute method of the executor',EXECUTOR_LABELS)
+STORM_TOPOLOGY_COMPONENT_EXECUTOR_PROCESS_LATENCY = Metric('storm_topology_component_executor_process_latency','Average time of the executor to ack a message after it was received',EXECUTOR_LABELS)
+STORM_TOPOLOGY_COMPONENT_EXECUTOR_COMPLETE_LATENCY = Metric('storm_topology_component_executor_complete_latency','Total latency for processing the messages emitted by the spout executor',EXECUTOR_LABELS)
+STORM_TOPOLOGY_COMPONENT_EXECUTOR_EMITTED = Metric('storm_topology_component_executor_emitted','Number of tuples emitted by the executor',EXECUTOR_LABELS)
+STORM_TOPOLOGY_COMPONENT_EXECUTOR_TRANSFERRED = Metric('storm_topology_component_executor_transferred','Number of tuples transferred by the executor',EXECUTOR_LABELS)
+STORM_TOPOLOGY_COMPONENT_EXECUTOR_ACKED = Metric('storm_topology_component_executor_acked','Number of tuples acked by the executor',EXECUTOR_LABELS)
+STORM_TOPOLOGY_COMPONENT_EXECUTOR_FAILED = Metric('storm_topology_component_executor_failed','Number of tuples failed by the executor',EXECUTOR_LABELS)
+
+# TOPOLOGY/ID/COMPONENT STREAM METRICS (opt-in component tier):
+STORM_TOPOLOGY_COMPONENT_STREAM_EMITTED = Metric('storm_topology_component_stream_emitted','Number of tuples emitted by the component on the stream',['topology_name', 'topology_id', 'component_id', 'stream'])
+STORM_TOPOLOGY_COMPONENT_STREAM_TRANSFERRED = Metric('storm_topology_component_stream_transferred','Number of tuples transferred by the component on the stream',['topology_name', 'topology_id', 'component_id', 'stream'])
+
+# SUPERVISOR/SUMMARY METRICS (opt-in component tier):
+STORM_SUPERVISOR_UPTIME_SECONDS = Metric('storm_supervisor_uptime_seconds','Shows how long the supervisor is running in seconds',['supervisor_id', 'host'])
+STORM_SUPERVISOR_SLOTS_TOTAL = Metric('storm_supervisor_slots_total','Total number of worker slots on the supervisor',['supervisor_id', 'host'])
+STORM_SUPERVISOR_SLOTS_USED = Metric('storm_supervisor_slots_used','Number of worker slots used on the supervisor',['supervisor_id', 'host'])
+STORM_SUPERVISOR_TOTAL_MEM = Metric('storm_supervisor_total_mem','Total memory capacity of the supervisor (MB)',['supervisor_id', 'host'])
+STORM_SUPERVISOR_USED_MEM = Metric('storm_supervisor_used_mem','Memory used by workers on the supervisor (MB)',['supervisor_id', 'host'])
+STORM_SUPERVISOR_TOTAL_CPU = Metric('storm_supervisor_total_cpu','Total CPU capacity of the supervisor (%)',['supervisor_id', 'host'])
+STORM_SUPERVISOR_USED_CPU = Metric('storm_supervisor_used_cpu','CPU used by workers on the supervisor (%)',['supervisor_id', 'host'])
+
+
+def counter_metrics(metric, description):
+    """Define the counter and per-second rate derived from a cumulative Storm metric (window label removed)."""
+    labelnames = [label for label in metric.labelnames if label != 'window']
+    return (Metric(metric.name, f'Total number of {description}, kept monotonic across Storm stats resets', labelnames, 'counter'),
+            Metric(f'{metric.name}_rate', f'Number of {description} per second between the last two refreshes', labelnames))
+
+
+# DERIVED COUNTER METRICS (--stats-mode counters):
+STORM_TOPOLOGY_STATS_TRANSFERRED_TOTAL, STORM_TOPOLOGY_STATS_TRANSFERRED_RATE = counter_metrics(STORM_TOPOLOGY_STATS_TRANSFERRED, 'messages transferred')
+STORM_TOPOLOGY_STATS_EMITTED_TOTAL, STORM_TOPOLOGY_STATS_EMITTED_RATE = counter_metrics(STORM_TOPOLOGY_STATS_EMITTED, 'messages emitted')
+STORM_TOPOLOGY_STATS_ACKED_TOTAL, STORM_TOPOLOGY_STATS_ACKED_RATE = counter_metrics(STORM_TOPOLOGY_STATS_ACKED, 'messages acked')
+STORM_TOPOLOGY_STATS_FAILED_TOTAL, STORM_TOPOLOGY_STATS_FAILED_RATE = counter_metrics(STORM_TOPOLOGY_STATS_FAILED, 'messages failed')
+STORM_TOPOLOGY_SPOUTS_EMITTED_TOTAL, STORM_TOPOLOGY_SPOUTS_EMITTED_RATE = counter_metrics(STORM_TOPOLOGY_SPOUTS_EMITTED, 'messages emitted by the spout')
+STORM_TOPOLOGY_SPOUTS_TRANSFERRED_TOTAL, STORM_TOPOLOGY_SPOUTS_TRANSFERRED_RATE = counter_metrics(STORM_TOPOLOGY_SPOUTS_TRANSFERRED, 'messages transferred by the spout')
+STORM_TOPOLOGY_SPOUTS_ACKED_TOTAL, STORM_TOPOLOGY_SPOUTS_ACKED_RATE = counter_metrics(STORM_TOPOLOGY_SPOUTS_ACKED, 'messages acked by the spout')
+STORM_TOPOLOGY_SPOUTS_FAILED_TOTAL, STORM_TOPOLOGY_SPOUTS_FAILED_RATE = counter_metrics(STORM_TOPOLOGY_SPOUTS_FAILED, 'messages failed by the spout')
+STORM_TOPOLOGY_BOLTS_ACKED_TOTAL, STORM_TOPOLOGY_BOLTS_ACKED_RATE = counter_metrics(STORM_TOPOLOGY_BOLTS_ACKED, 'tuples acked by the bolt')
+STORM_TOPOLOGY_BOLTS_FAILED_TOTAL, STORM_TOPOLOGY_BOLTS_FAILED_RATE = counter_metrics(STORM_TOPOLOGY_BOLTS_FAILED, 'tuples failed by the bolt')
+STORM_TOPOLOGY_BOLTS_EMITTED_TOTAL, STORM_TOPOLOGY_BOLTS_EMITTED_RATE = counter_metrics(STORM_TOPOLOGY_BOLTS_EMITTED, 'tuples emitted by the bolt')
+STORM_TOPOLOGY_COMPONENT_EXECUTOR_EMITTED_TOTAL, STORM_TOPOLOGY_COMPONENT_EXECUTOR_EMITTED_RATE = counter_metrics(STORM_TOPOLOGY_COMPONENT_EXECUTOR_EMITTED, 'tuples emitted by the executor')
+STORM_TOPOLOGY_COMPONENT_EXECUTOR_TRANSFERRED_TOTAL, STORM_TOPOLOGY_COMPONENT_EXECUTOR_TRANSFERRED_RATE = counter_metrics(STORM_TOPOLOGY_COMPONENT_EXECUTOR_TRANSFERRED, 'tuples transferred by the executor')
+STORM_TOPOLOGY_COMPONENT_EXECUTOR_ACKED_TOTAL, STORM_TOPOLOGY_COMPONENT_EXECUTOR_ACKED_RATE = counter_metrics(STORM_TOPOLOGY_COMPONENT_EXECUTOR_ACKED, 'tuples acked by the executor')
+STORM_TOPOLOGY_COMPONENT_EXECUTOR_FAILED_TOTAL, STORM_TOPOLOGY_COMPONENT_EXECUTOR_FAILED_RATE = counter_metrics(STORM_TOPOLOGY_COMPONENT_EXECUTOR_FAILED, 'tuples failed by the executor')
+STORM_TOPOLOGY_COMPONENT_STREAM_EMITTED_TOTAL, STORM_TOPOLOGY_COMPONENT_STREAM_EMITTED_RATE = counter_metrics(STORM_TOPOLOGY_COMPONENT_STREAM_EMITTED, 'tuples emitted by the component on the stream')
+STORM_TOPOLOGY_COMPONENT_STREAM_TRANSFERRED_TOTAL, STORM_TOPOLOGY_COMPONENT_STREAM_TRANSFERRED_RATE = counter_metrics(STORM_TOPOLOGY_COMPONENT_STREAM_TRANSFERRED, 'tuples transferred by the component on the stream')
+
+# Cumulative metric name -> (counter, rate) replacing it in counters mode
+COUNTER_METRICS = {
+    STORM_TOPOLOGY_STATS_TRANSFERRED.name: (STORM_TOPOLOGY_STATS_TRANSFERRED_TOTAL, STORM_TOPOLOGY_STATS_TRANSFERRED_RATE),
+    STORM_TOPOLOGY_STATS_EMITTED.name: (STORM_TOPOLOGY_STATS_EMITTED_TOTAL, STORM_TOPOLOGY_STATS_EMITTED_RATE),
+    STORM_TOPOLOGY_STATS_ACKED.name: (STORM_TOPOLOGY_STATS_ACKED_TOTAL, STORM_TOPOLOGY_STATS_ACKED_RATE),
+    STORM_TOPOLOGY_STATS_FAILED.name: (STORM_TOPOLOGY_STATS_FAILED_TOTAL, STORM_TOPOLOGY_STATS_FAILED_RATE),
+    STORM_TOPOLOGY_SPOUTS_EMITTED.name: (STORM_TOPOLOGY_SPOUTS_EMITTED_TOTAL, STORM_TOPOLOGY_SPOUTS_EMITTED_RATE),
+    STORM_TOPOLOGY_SPOUTS_TRANSFERRED.name: (STORM_TOPOLOGY_SPOUTS_TRANSFERRED_TOTAL, STORM_TOPOLOGY_SPOUTS_TRANSFERRED_RATE),
+    STORM_TOPOLOGY_SPOUTS_ACKED.name: (STORM_TOPOLOGY_SPOUTS_ACKED_TOTAL, STORM_TOPOLOGY_SPOUTS_ACKED_RATE),
+    STORM_TOPOLOGY_SPOUTS_FAILED.name: (STORM_TOPOLOGY_SPOUTS_FAILED_TOTAL, STORM_TOPOLOGY_SPOUTS_FAILED_RATE),
+    STORM_TOPOLOGY_BOLTS_ACKED.name: (STORM_TOPOLOGY_BOLTS_ACKED_TOTAL, STORM_TOPOLOGY_BOLTS_ACKED_RATE),
+    STORM_TOPOLOGY_BOLTS_FAILED.name: (STORM_TOPOLOGY_BOLTS_FAILED_TOTAL, STORM_TOPOLOGY_BOLTS_FAILED_RATE),
+    STORM_TOPOLOGY_BOLTS_EMITTED.name: (STORM_TOPOLOGY_BOLTS_EMITTED_TOTAL, STORM_TOPOLOGY_BOLTS_EMITTED_RATE),
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_EMITTED.name: (STORM_TOPOLOGY_COMPONENT_EXECUTOR_EMITTED_TOTAL, STORM_TOPOLOGY_COMPONENT_EXECUTOR_EMITTED_RATE),
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_TRANSFERRED.name: (STORM_TOPOLOGY_COMPONENT_EXECUTOR_TRANSFERRED_TOTAL, STORM_TOPOLOGY_COMPONENT_EXECUTOR_TRANSFERRED_RATE),
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_ACKED.name: (STORM_TOPOLOGY_COMPONENT_EXECUTOR_ACKED_TOTAL, STORM_TOPOLOGY_COMPONENT_EXECUTOR_ACKED_RATE),
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_FAILED.name: (STORM_TOPOLOGY_COMPONENT_EXECUTOR_FAILED_TOTAL, STORM_TOPOLOGY_COMPONENT_EXECUTOR_FAILED_RATE),
+    STORM_TOPOLOGY_COMPONENT_STREAM_EMITTED.name: (STORM_TOPOLOGY_COMPONENT_STREAM_EMITTED_TOTAL, STORM_TOPOLOGY_COMPONENT_STREAM_EMITTED_RATE),
+    STORM_TOPOLOGY_COMPONENT_STREAM_TRANSFERRED.name: (STORM_TOPOLOGY_COMPONENT_STREAM_TRANSFERRED_TOTAL, STORM_TOPOLOGY_COMPONENT_STREAM_TRANSFERRED_RATE),
+}
+
+METRICS = (
+    STORM_TOPOLOGY_UPTIME_SECONDS,
+    STORM_TOPOLOGY_TASKS_TOTAL,
+    STORM_TOPOLOGY_WORKERS_TOTAL,
+    STORM_TOPOLOGY_EXECUTORS_TOTAL,
+    STORM_TOPOLOGY_REPLICATION_COUNT,
+    STORM_TOPOLOGY_REQUESTED_MEM_ON_HEAP,
+    STORM_TOPOLOGY_REQUESTED_MEM_OFF_HEAP,
+    STORM_TOPOLOGY_REQUESTED_TOTAL_MEM,
+    STORM_TOPOLOGY_REQUESTED_CPU,
+    STORM_TOPOLOGY_ASSIGNED_MEM_ON_HEAP,
+    STORM_TOPOLOGY_ASSIGNED_MEM_OFF_HEAP,
+    STORM_TOPOLOGY_ASSIGNED_TOTAL_MEM,
+    STORM_TOPOLOGY_ASSIGNED_CPU,
+    STORM_TOPOLOGY_DATA_TIMESTAMP_SECONDS,
+    STORM_TOPOLOGY_STATS_TRANSFERRED,
+    STORM_TOPOLOGY_STATS_EMITTED,
+    STORM_TOPOLOGY_STATS_COMPLETE_LATENCY,
+    STORM_TOPOLOGY_STATS_ACKED,
+    STORM_TOPOLOGY_STATS_FAILED,
+    STORM_TOPOLOGY_SPOUTS_EXECUTORS,
+    STORM_TOPOLOGY_SPOUTS_EMITTED,
+    STORM_TOPOLOGY_SPOUTS_COMPLETE_LATENCY,
+    STORM_TOPOLOGY_SPOUTS_TRANSFERRED,
+    STORM_TOPOLOGY_SPOUTS_TASKS,
+    STORM_TOPOLOGY_SPOUTS_ACKED,
+    STORM_TOPOLOGY_SPOUTS_FAILED,
+    STORM_TOPOLOGY_BOLTS_PROCESS_LATENCY,
+    STORM_TOPOLOGY_BOLTS_CAPACITY,
+    STORM_TOPOLOGY_BOLTS_EXECUTE_LATENCY,
+    STORM_TOPOLOGY_BOLTS_EXECUTORS,
+    STORM_TOPOLOGY_BOLTS_TASKS,
+    STORM_TOPOLOGY_BOLTS_ACKED,
+    STORM_TOPOLOGY_BOLTS_FAILED,
+    STORM_TOPOLOGY_BOLTS_EMITTED,
+    STORM_TOPOLOGY_STATS_TRANSFERRED_TOTAL,
+    STORM_TOPOLOGY_STATS_TRANSFERRED_RATE,
+    STORM_TOPOLOGY_STATS_EMITTED_TOTAL,
+    STORM_TOPOLOGY_STATS_EMITTED_RATE,
+    STORM_TOPOLOGY_STATS_ACKED_TOTAL,
+    STORM_TOPOLOGY_STATS_ACKED_RATE,
+    STORM_TOPOLOGY_STATS_FAILED_TOTAL,
+    STORM_TOPOLOGY_STATS_FAILED_RATE,
+    STORM_TOPOLOGY_SPOUTS_EMITTED_TOTAL,
+    STORM_TOPOLOGY_SPOUTS_EMITTED_RATE,
+    STORM_TOPOLOGY_SPOUTS_TRANSFERRED_TOTAL,
+    STORM_TOPOLOGY_SPOUTS_TRANSFERRED_RATE,
+    STORM_TOPOLOGY_SPOUTS_ACKED_TOTAL,
+    STORM_TOPOLOGY_SPOUTS_ACKED_RATE,
+    STORM_TOPOLOGY_SPOUTS_FAILED_TOTAL,
+    STORM_TOPOLOGY_SPOUTS_FAILED_RATE,
+    STORM_TOPOLOGY_BOLTS_ACKED_TOTAL,
+    STORM_TOPOLOGY_BOLTS_ACKED_RATE,
+    STORM_TOPOLOGY_BOLTS_FAILED_TOTAL,
+    STORM_TOPOLOGY_BOLTS_FAILED_RATE,
+    STORM_TOPOLOGY_BOLTS_EMITTED_TOTAL,
+    STORM_TOPOLOGY_BOLTS_EMITTED_RATE,
+)
+
+COMPONENT_METRICS = (
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_UPTIME_SECONDS,
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_CAPACITY,
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_EXECUTE_LATENCY,
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_PROCESS_LATENCY,
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_COMPLETE_LATENCY,
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_EMITTED,
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_TRANSFERRED,
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_ACKED,
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_FAILED,
+    STORM_TOPOLOGY_COMPONENT_STREAM_EMITTED,
+    STORM_TOPOLOGY_COMPONENT_STREAM_TRANSFERRED,
+    STORM_SUPERVISOR_UPTIME_SECONDS,
+    STORM_SUPERVISOR_SLOTS_TOTAL,
+    STORM_SUPERVISOR_SLOTS_USED,
+    STORM_SUPERVISOR_TOTAL_MEM,
+    STORM_SUPERVISOR_USED_MEM,
+    STORM_SUPERVISOR_TOTAL_CPU,
+    STORM_SUPERVISOR_USED_CPU,
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_EMITTED_TOTAL,
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_EMITTED_RATE,
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_TRANSFERRED_TOTAL,
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_TRANSFERRED_RATE,
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_ACKED_TOTAL,
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_ACKED_RATE,
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_FAILED_TOTAL,
+    STORM_TOPOLOGY_COMPONENT_EXECUTOR_FAILED_RATE,
+    STORM_TOPOLOGY_COMPONENT_STREAM_EMITTED_TOTAL,
+    STORM_TOPOLOGY_COMPONENT_STREAM_EMITTED_RATE,
+    STORM_TOPOLOGY_COMPONENT_STREAM_TRANSFERRED_TOTAL,
+    STORM_TOPOLOGY_COMPONENT_STREAM_TRANSFERRED_RATE,
+)
+
+
+# EXPORTER SELF METRICS:
+STORM_EXPORTER_CYCLE_DURATION_SECONDS = Histogram('storm_exporter_cycle_duration_seconds','Duration of a refresh cycle in seconds',['cluster', 'tier'],buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, 60, 120, 300))
+STORM_EXPORTER_REQUEST_DURATION_SECONDS = Histogram('storm_exporter_request_duration_seconds','Duration of Storm UI requests in seconds until the response was received, or its headers for streamed topology details',['cluster', 'endpoint'],buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+STORM_EXPORTER_FETCH_ERRORS = Counter('storm_exporter_fetch_errors','Number of failed Storm UI requests by topology and error type',['cluster', 'endpoint', 'topology_name', 'error'])
+STORM_EXPORTER_LAST_SUCCESSFUL_CYCLE = Gauge('storm_exporter_last_successful_cycle_timestamp_seconds','Unix time of the last refresh cycle that published new data',['cluster', 'tier'])
+STORM_EXPORTER_DROPPED_SERIES = Counter('storm_exporter_dropped_series','Number of series dropped because a topology exceeded --max-series-per-topology, counted again on every refresh cycle',['cluster', 'topology_name'])
+STORM_EXPORTER_SKIPPED_CYCLES = Counter('storm_exporter_skipped_cycles','Number of refresh cycles skipped because the previous one was still running',['cluster', 'tier'])
+STORM_EXPORTER_DELAYED_CYCLES = Counter('storm_exporter_delayed_cycles','Number of refresh cycles started late because the previous one was still running',['cluster', 'tier'])
+
+
+class InvalidContentTypeError(ValueError):
+    """Storm UI answered with something else than JSON."""
+
+
+# A group of samples refreshed together, e.g. the summary or the details of one topology
+SampleGroup = namedtuple('SampleGroup', ['samples', 'generation', 'fetched'])
+
+# Immutable result of a refresh cycle of one cluster
+Snapshot = namedtuple('Snapshot', ['cluster', 'generation', 'groups'])
+
+
+class SnapshotBuilder:
+    """Collect the sample groups of one refresh cycle into a new snapshot."""
+
+    def __init__(self, previous):
+        self.previous = previous
+        self.cluster = previous.cluster
+        self.generation = previous.generation + 1
+        self.groups = {}
+        self.lock = threading.Lock()
+
+    def add(self, key, samples):
+        with self.lock:
+            self.groups[key] = SampleGroup(tuple(samples), self.generation, time.time())
+
+    def keep(self, key):
+        """Carry over a group from the previous snapshot as if it was refreshed in this cycle."""
+        group = self.previous.groups.get(key)
+        if group is not None:
+            with self.lock:
+                self.groups[key] = group._replace(generation=self.generation)
+
+    def fetched(self, key):
+        """Unix time the data of a group was fetched, looking at the previous snapshot when not refreshed in this cycle."""
+        group = self.groups.get(key) or self.previous.groups.get(key)
+        return group.fetched if group is not None else None
+
+    def build(self, max_missed_cycles=0, max_series_per_topology=0):
+        """Carry over groups missing from this cycle until they missed max_missed_cycles cycles."""
+        groups = dict(self.groups)
+        for key, group in self.previous.groups.items():
+            if key in groups:
+                continue
+            if max_missed_cycles <= 0 or self.generation - group.generation < max_missed_cycles:
+                groups[key] = group
+        if max_series_per_topology > 0:
+            groups = limit_series(groups, self.cluster, max_series_per_topology)
+        return Snapshot(self.cluster, self.generation, groups)
+
+
+# Order in which the groups of a topology use up its series budget, component groups have their own tier and budget
+GROUP_PRIORITY = {'summary': 0, 'detail': 1}
+
+
+def limit_series(groups, cluster, max_series_per_topology):
+    """Truncate the groups of each topology to max_series_per_topology samples in total, counting the dropped ones.
+
+    Groups keyed by (topology_id, kind, ...) share the budget of their topology
+    within the snapshot of one tier, other groups such as the supervisors are
+    not limited.
+    """
+    limited = {key: group for key, group in groups.items() if len(key) < 2}
+    budgets = {}
+    topology_keys = sorted((key for key in groups if len(key) > 1),
+                           key=lambda key: (key[0], GROUP_PRIORITY.get(key[1], len(GROUP_PRIORITY)), key[2:]))
+    for key in topology_keys:
+        group = groups[key]
+        budget = budgets.get(key[0], max_series_per_topology)
+        if len(group.samples) > budget:
+            topology_name = group.samples[0][1][0]
+            STORM_EXPORTER_DROPPED_SERIES.labels(cluster, topology_name).inc(len(group.samples) - budget)
+            group = group._replace(samples=group.samples[:budget])
+        budgets[key[0]] = budget - len(group.samples)
+        limited[key] = group
+    return limited
+
+
+def build_metric_families(snapshots, metrics, drop_topology_id=False):
+    """Merge the snapshots of all clusters into one family per metric.
+
+    The cluster label is only added once a named cluster is configured, so
+    single cluster deployments keep their original label sets. Without the
+    topology_id label a redeployed topology could be exported twice while
+    its previous ID is carried over, the most recently refreshed one wins.
+    """
+    with_cluster = any(cluster for cluster in snapshots)
+    cluster_labels = ['cluster'] if with_cluster else []
+    dropped_labels = ('topology_id',) if drop_topology_id else ()
+    families = {(metric.name, metric.kind): (CounterMetricFamily if metric.kind == 'counter' else GaugeMetricFamily)(
+                    metric.name, metric.documentation,
+                    labels=cluster_labels + [label for label in metric.labelnames if label not in dropped_labels])
+                for metric in metrics}
+    series = {key: {} for key in families}
+    for cluster, snapshot in snapshots.items():
+        cluster_values = (cluster,) if with_cluster else ()
+        for group in sorted(snapshot.groups.values(), key=lambda group: group.generation):
+            for metric, labelvalues, value in group.samples:
+                if dropped_labels and 'topology_id' in metric.labelnames:
+                    index = metric.labelnames.index('topology_id')
+                    labelvalues = labelvalues[:index] + labelvalues[index + 1:]
+                series[metric.name, metric.kind][cluster_values + labelvalues] = value
+    for key, family in families.items():
+        for labelvalues, value in series[key].items():
+            family.add_metric(labelvalues, value)
+    # Window gauges and the counters replacing them share a name, only one of them is ever populated
+    return tuple(family for family in families.values() if family.samples)
+
+
+class StormCollector(Collector):
+    """Expose the latest complete snapshot of every cluster, replaced atomically after each refresh cycle."""
+
+    def __init__(self, metrics=METRICS):
+        self.metrics = metrics
+        self.snapshots = {}
+        self.families = build_metric_families(self.snapshots, metrics)
+        self.lock = threading.Lock()
+
+    def snapshot(self, cluster=''):
+        return self.snapshots.get(cluster) or Snapshot(cluster, 0, {})
+
+    def publish(self, snapshot):
+        # Families are pre-built here so scrapes only read a single reference
+        with self.lock:
+            snapshots = dict(self.snapshots)
+            snapshots[snapshot.cluster] = snapshot
+            self.families = build_metric_families(snapshots, self.metrics, CARDINALITY.drop_topology_id)
+            self.snapshots = snapshots
+
+    def collect(self):
+        return self.families
+
+
+class CardinalityLimits:
+    """Topology and component filters and label limits, checked before anything is fetched from Storm UI.
+
+    Include and exclude patterns are regular expressions matched against the
+    whole topology name or component ID, excludes win over includes.
+    """
+
+    def __init__(self, topology_include=None, topology_exclude=None, component_include=None, component_exclude=None,
+                 drop_topology_id=False, max_series_per_topology=0):
+        self.topology_include = re.compile(topology_include) if topology_include else None
+        self.topology_exclude = re.compile(topology_exclude) if topology_exclude else None
+        self.component_include = re.compile(component_include) if component_include else None
+        self.component_exclude = re.compile(component_exclude) if component_exclude else None
+        self.drop_topology_id = drop_topology_id
+        self.max_series_per_topology = max_series_per_topology
+
+    @staticmethod
+    def matches(name, include, exclude):
+        if include is not None and not include.fullmatch(name):
+            return False
+        return exclude is None or not exclude.fullmatch(name)
+
+    def allow_topology(self, topology_name):
+        return self.matches(topology_name, self.topology_include, self.topology_exclude)
+
+    def allow_component(self, component_id):
+        return self.matches(component_id, self.component_include, self.component_exclude)
+
+
+CARDINALITY = CardinalityLimits()
+
+
+def configure_cardinality(**limits):
+    """Replace the topology and component filters and label limits, see CardinalityLimits."""
+    global CARDINALITY
+    CARDINALITY = CardinalityLimits(**limits)
+
+
+STORM_COLLECTOR = StormCollector()
+REGISTRY.register(STORM_COLLECTOR)
+
+COMPONENT_COLLECTOR = StormCollector(COMPONENT_METRICS)
+REGISTRY.register(COMPONENT_COLLECTOR)
+
+# Exposition rendered once per refresh cycle, in plain and gzip form
+Exposition = namedtuple('Exposition', ['body', 'gzip_body', 'etag', 'gzip_etag'])
+
+
+class MetricsCache:
+    """Render the registry once per refresh cycle instead of once per scrape."""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.exposition = None
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        # Serialize renders so a slow render cannot replace a newer exposition
+        with self.lock:
+            body = generate_latest(self.registry)
+            # Strong validators must differ between content codings of the same body
+            digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+            self.exposition = Exposition(body, gzip.compress(body), f'"{digest}"', f'"{digest}-gzip"')
+
+
+METRICS_CACHE = MetricsCache(REGISTRY)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serve the cached exposition, honouring gzip and If-None-Match."""
+
+    # Headers and body are written separately, avoid delayed ACK stalls on keep-alive connections
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_exposition(include_body=True)
+
+    def do_HEAD(self):
+        self.send_exposition(include_body=False)
+
+    def send_exposition(self, include_body):
+        if self.path == '/favicon.ico':
+            self.send_error(404)
+            return
+
+        exposition = METRICS_CACHE.exposition
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body, etag, content_encoding = exposition.gzip_body, exposition.gzip_etag, 'gzip'
+        else:
+            body, etag, content_encoding = exposition.body, exposition.etag, None
+
+        if etag in (tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE_LATEST)
+        self.send_header('ETag', etag)
+        # The body depends on Accept-Encoding, caches must not hand gzip to clients that did not ask for it
+        self.send_header('Vary', 'Accept-Encoding')
+        if content_encoding:
+            self.send_header('Content-Encoding', content_encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if include_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, addr=''):
+    """Start serving the cached exposition from a daemon thread."""
+    if METRICS_CACHE.exposition is None:
+        METRICS_CACHE.refresh()
+    server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# What the adaptive poller remembers about a topology after fetching its details
+PollState = namedtuple('PollState', ['fingerprint', 'uptime', 'stats', 'busy', 'last_polled'])
+
+
+class AdaptivePoller:
+    """Decide per topology whether its details have to be fetched in this cycle.
+
+    Busy or degraded topologies are polled on every cycle, idle and non-ACTIVE
+    ones only every idle_refresh_rate seconds.
+    """
+
+    def __init__(self, idle_refresh_rate=0, busy_capacity=0.8):
+        self.idle_refresh_rate = idle_refresh_rate
+        self.busy_capacity = busy_capacity
+        self.states = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(topology_summary):
+        return tuple(topology_summary.get(key) for key in ('status', 'tasksTotal', 'workersTotal', 'executorsTotal'))
+
+    @staticmethod
+    def window_stats(topology_data):
+        return {stat.get('window'): (stat.get('emitted'), stat.get('acked'), stat.get('failed'))
+                for stat in topology_data.get('topologyStats', [])}
+
+    def should_poll(self, topology_summary, now=None):
+        if self.idle_refresh_rate <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+
+        with self.lock:
+            state = self.states.get(topology_summary.get('id'))
+        if state is None or state.busy:
+            return True
+        # A changed layout, status or a restart always triggers a refresh
+        if state.fingerprint != self.fingerprint(topology_summary):
+            return True
+        if get_metric(topology_summary.get('uptimeSeconds')) < state.uptime:
+            return True
+        return now - state.last_polled >= self.idle_refresh_rate
+
+    def record(self, topology_summary, topology_data, now=None):
+        now = time.monotonic() if now is None else now
+        topology_id = topology_summary.get('id')
+        stats = self.window_stats(topology_data)
+
+        with self.lock:
+            previous = self.states.get(topology_id)
+        previous_stats = previous.stats if previous else {}
+
+        capacity = max((float(get_metric(bolt.get('capacity'))) for bolt in topology_data.get('bolts', [])), default=0)
+        failing = any(float(get_metric(failed)) > float(get_metric(previous_stats.get(window, (None, None, None))[2]))
+                      for window, (_, _, failed) in stats.items())
+        moving = topology_summary.get('status') == 'ACTIVE' and stats != previous_stats
+        busy = capacity >= self.busy_capacity or failing or moving
+
+        with self.lock:
+            self.states[topology_id] = PollState(
+                self.fingerprint(topology_summary), get_metric(topology_summary.get('uptimeSeconds')), stats, busy, now)
+
+    def prune(self, topology_ids):
+        """Forget topologies that are no longer reported by Storm UI."""
+        with self.lock:
+            for topology_id in set(self.states) - set(topology_ids):
+                del self.states[topology_id]
+
+
+ADAPTIVE_POLLING = (0, 0.8)  # (idle_refresh_rate, busy_capacity)
+ADAPTIVE_POLLERS = {}
+ADAPTIVE_POLLERS_LOCK = threading.Lock()
+
+
+def configure_adaptive_polling(idle_refresh_rate, busy_capacity):
+    """Poll idle topologies only every idle_refresh_rate seconds (0 polls every topology on every cycle)."""
+    global ADAPTIVE_POLLING
+    with ADAPTIVE_POLLERS_LOCK:
+        ADAPTIVE_POLLING = (idle_refresh_rate, busy_capacity)
+        ADAPTIVE_POLLERS.clear()
+
+
+def get_adaptive_poller(cluster=''):
+    """Return the adaptive poller of a cluster, topology IDs are only unique within a cluster."""
+    with ADAPTIVE_POLLERS_LOCK:
+        if cluster not in ADAPTIVE_POLLERS:
+            ADAPTIVE_POLLERS[cluster] = AdaptivePoller(*ADAPTIVE_POLLING)
+        return ADAPTIVE_POLLERS[cluster]
+
+
+# Last cumulative value seen for a series, the counter derived from it and its rate
+CounterState = namedtuple('CounterState', ['value', 'total', 'rate', 'last_seen'])
+
+
+class CounterTracker:
+    """Turn Storm's cumulative all-time values into monotonic counters and per-second rates.
+
+    A drop of Storm's all-time value usually means only part of the stats was
+    reset, e.g. one worker restarted or the topology was rebalanced. The
+    counter then holds its value and counts again from the new baseline,
+    so a partial reset never shows up as a burst of messages.
+    """
+
+    def __init__(self, export_rates=False):
+        self.export_rates = export_rates
+        self.states = {}
+        self.lock = threading.Lock()
+
+    def update(self, key, value, now=None):
+        """Record a cumulative value and return the (counter, rate) of the series, rate is None on first sight."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            previous = self.states.get(key)
+            if previous is None:
+                state = CounterState(value, value, None, now)
+            else:
+                elapsed = now - previous.last_seen
+                if value < previous.value:
+                    # The messages counted since the last refresh are unknown, keep the last rate
+                    increase, rate = 0, previous.rate
+                else:
+                    increase = value - previous.value
+                    rate = increase / elapsed if elapsed > 0 else previous.rate
+                state = CounterState(value, previous.total + increase, rate, now)
+            self.states[key] = state
+        return state.total, state.rate
+
+    def prune(self, snapshot, metrics):
+        """Forget the series of a tier that are no longer exported.
+
+        This covers killed topologies as well as removed components and
+        executors moved to another host or port by a rebalance. Series carried
+        over by the snapshot, e.g. for idle topologies, are kept.
+        """
+        names = {metric.name for metric in metrics if metric.kind == 'counter'}
+        exported = {(snapshot.cluster, labelvalues[1], metric.name, labelvalues)
+                    for group in snapshot.groups.values()
+                    for metric, labelvalues, _ in group.samples if metric.kind == 'counter'}
+        with self.lock:
+            for key in [key for key in self.states if key[0] == snapshot.cluster and key[2] in names and key not in exported]:
+                del self.states[key]
+
+
+COUNTER_TRACKER = None  # CounterTracker when --stats-mode is counters
+
+
+def configure_stats_mode(stats_mode, export_rates=False):
+    """Export cumulative Storm stats as one gauge per window ('windows') or as counters ('counters').
+
+    With export_rates, counters mode also exports the per-second rate of every counter.
+    """
+    global COUNTER_TRACKER
+    COUNTER_TRACKER = CounterTracker(export_rates) if stats_mode == 'counters' else None
+
+
+def derive_counters(samples, cluster=''):
+    """Replace cumulative samples by their counter, and optionally rate, when counters mode is enabled.
+
+    Only the all-time window is kept for windowed stats, the other windows are dropped.
+    """
+    tracker = COUNTER_TRACKER
+    if tracker is None:
+        return samples
+
+    derived = []
+    for metric, labelvalues, value in samples:
+        if metric.name not in COUNTER_METRICS:
+            derived.append((metric, labelvalues, value))
+            continue
+        if 'window' in metric.labelnames:
+            index = metric.labelnames.index('window')
+            if labelvalues[index] != ALL_TIME_WINDOW:
+                continue
+            labelvalues = labelvalues[:index] + labelvalues[index + 1:]
+        counter, rate = COUNTER_METRICS[metric.name]
+        # Every derived metric is labelled (topology_name, topology_id, ...)
+        total, per_second = tracker.update((cluster, labelvalues[1], metric.name, labelvalues), value)
+        derived.append((counter, labelvalues, total))
+        if tracker.export_rates and per_second is not None:
+            derived.append((rate, labelvalues, per_second))
+    return derived
+
+
+def configure_http_session(pool_size, connect_timeout, read_timeout, hosts=1):
+    """Configure connection pooling, timeouts and compression for Storm UI requests."""
+    global HTTP_TIMEOUT
+
+    adapter = HTTPAdapter(pool_connections=hosts, pool_maxsize=pool_size, pool_block=True)
+    HTTP_SESSION.mount('http://', adapter)
+    HTTP_SESSION.mount('https://', adapter)
+    HTTP_SESSION.headers.update({'Accept-Encoding': 'gzip', 'Connection': 'keep-alive'})
+    HTTP_TIMEOUT = (connect_timeout, read_timeout)
 
 
 def get_metric(metric):
@@ -59,106 +718,528 @@ def get_metric(metric):
         return metric
 
 
-def update_stats_metrics(stat, topology_name, topology_id):
+def add_sample(samples, metric, labelvalues, value):
+    """Append a sample for the snapshot being built."""
+    samples.append((metric, tuple(str(label) for label in labelvalues), float(get_metric(value))))
+
+
+def update_stats_metrics(stat, topology_name, topology_id, samples):
     window = stat.get('window', 'N/A')
 
-    STORM_TOPOLOGY_STATS_TRANSFERRED.labels(topology_name, topology_id, window).set(get_metric(stat.get('transferred')))
-    STORM_TOPOLOGY_STATS_EMITTED.labels(topology_name, topology_id, window).set(get_metric(stat.get('emitted')))
-    STORM_TOPOLOGY_STATS_COMPLETE_LATENCY.labels(topology_name, topology_id, window).set(get_metric(stat.get('completeLatency')))
-    STORM_TOPOLOGY_STATS_ACKED.labels(topology_name, topology_id, window).set(get_metric(stat.get('acked')))
-    STORM_TOPOLOGY_STATS_FAILED.labels(topology_name, topology_id, window).set(get_metric(stat.get('failed')))
+    add_sample(samples, STORM_TOPOLOGY_STATS_TRANSFERRED, (topology_name, topology_id, window), stat.get('transferred'))
+    add_sample(samples, STORM_TOPOLOGY_STATS_EMITTED, (topology_name, topology_id, window), stat.get('emitted'))
+    add_sample(samples, STORM_TOPOLOGY_STATS_COMPLETE_LATENCY, (topology_name, topology_id, window), stat.get('completeLatency'))
+    add_sample(samples, STORM_TOPOLOGY_STATS_ACKED, (topology_name, topology_id, window), stat.get('acked'))
+    add_sample(samples, STORM_TOPOLOGY_STATS_FAILED, (topology_name, topology_id, window), stat.get('failed'))
 
 
-def update_spout_metrics(spout, topology_name, topology_id):
+def update_spout_metrics(spout, topology_name, topology_id, samples):
     spout_id = spout.get('spoutId', 'N/A')
 
-    STORM_TOPOLOGY_SPOUTS_EXECUTORS.labels(topology_name, topology_id, spout_id).set(get_metric(spout.get('executors')))
-    STORM_TOPOLOGY_SPOUTS_EMITTED.labels(topology_name, topology_id, spout_id).set(get_metric(spout.get('emitted')))
-    STORM_TOPOLOGY_SPOUTS_COMPLETE_LATENCY.labels(topology_name, topology_id, spout_id).set(get_metric(spout.get('completeLatency')))
-    STORM_TOPOLOGY_SPOUTS_TRANSFERRED.labels(topology_name, topology_id, spout_id).set(get_metric(spout.get('transferred')))
-    STORM_TOPOLOGY_SPOUTS_TASKS.labels(topology_name, topology_id, spout_id).set(get_metric(spout.get('tasks')))
-    STORM_TOPOLOGY_SPOUTS_ACKED.labels(topology_name, topology_id, spout_id).set(get_metric(spout.get('acked')))
-    STORM_TOPOLOGY_SPOUTS_FAILED.labels(topology_name, topology_id, spout_id).set(get_metric(spout.get('failed')))
+    add_sample(samples, STORM_TOPOLOGY_SPOUTS_EXECUTORS, (topology_name, topology_id, spout_id), spout.get('executors'))
+    add_sample(samples, STORM_TOPOLOGY_SPOUTS_EMITTED, (topology_name, topology_id, spout_id), spout.get('emitted'))
+    add_sample(samples, STORM_TOPOLOGY_SPOUTS_COMPLETE_LATENCY, (topology_name, topology_id, spout_id), spout.get('completeLatency'))
+    add_sample(samples, STORM_TOPOLOGY_SPOUTS_TRANSFERRED, (topology_name, topology_id, spout_id), spout.get('transferred'))
+    add_sample(samples, STORM_TOPOLOGY_SPOUTS_TASKS, (topology_name, topology_id, spout_id), spout.get('tasks'))
+    add_sample(samples, STORM_TOPOLOGY_SPOUTS_ACKED, (topology_name, topology_id, spout_id), spout.get('acked'))
+    add_sample(samples, STORM_TOPOLOGY_SPOUTS_FAILED, (topology_name, topology_id, spout_id), spout.get('failed'))
 
 
-def update_bolt_metrics(bolt, topology_name, topology_id):
+def update_bolt_metrics(bolt, topology_name, topology_id, samples):
     bolt_id = bolt.get('boltId', 'N/A')
 
-    STORM_TOPOLOGY_BOLTS_PROCESS_LATENCY.labels(topology_name, topology_id, bolt_id).set(get_metric(bolt.get('processLatency')))
-    STORM_TOPOLOGY_BOLTS_CAPACITY.labels(topology_name, topology_id, bolt_id).set(get_metric(bolt.get('capacity')))
-    STORM_TOPOLOGY_BOLTS_EXECUTE_LATENCY.labels(topology_name, topology_id, bolt_id).set(get_metric(bolt.get('executeLatency')))
-    STORM_TOPOLOGY_BOLTS_EXECUTORS.labels(topology_name, topology_id, bolt_id).set(get_metric(bolt.get('executors')))
-    STORM_TOPOLOGY_BOLTS_TASKS.labels(topology_name, topology_id, bolt_id).set(get_metric(bolt.get('tasks')))
-    STORM_TOPOLOGY_BOLTS_ACKED.labels(topology_name, topology_id, bolt_id).set(get_metric(bolt.get('acked')))
-    STORM_TOPOLOGY_BOLTS_FAILED.labels(topology_name, topology_id, bolt_id).set(get_metric(bolt.get('failed')))
-    STORM_TOPOLOGY_BOLTS_EMITTED.labels(topology_name, topology_id, bolt_id).set(get_metric(bolt.get('emitted')))
+    add_sample(samples, STORM_TOPOLOGY_BOLTS_PROCESS_LATENCY, (topology_name, topology_id, bolt_id), bolt.get('processLatency'))
+    add_sample(samples, STORM_TOPOLOGY_BOLTS_CAPACITY, (topology_name, topology_id, bolt_id), bolt.get('capacity'))
+    add_sample(samples, STORM_TOPOLOGY_BOLTS_EXECUTE_LATENCY, (topology_name, topology_id, bolt_id), bolt.get('executeLatency'))
+    add_sample(samples, STORM_TOPOLOGY_BOLTS_EXECUTORS, (topology_name, topology_id, bolt_id), bolt.get('executors'))
+    add_sample(samples, STORM_TOPOLOGY_BOLTS_TASKS, (topology_name, topology_id, bolt_id), bolt.get('tasks'))
+    add_sample(samples, STORM_TOPOLOGY_BOLTS_ACKED, (topology_name, topology_id, bolt_id), bolt.get('acked'))
+    add_sample(samples, STORM_TOPOLOGY_BOLTS_FAILED, (topology_name, topology_id, bolt_id), bolt.get('failed'))
+    add_sample(samples, STORM_TOPOLOGY_BOLTS_EMITTED, (topology_name, topology_id, bolt_id), bolt.get('emitted'))
+
+
+class ChunkReader:
+    """File-like adapter feeding decoded response chunks to the streaming JSON parser."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+
+    def read(self, size=-1):
+        # ijson probes the stream type with read(0), which must not consume a chunk
+        if size == 0:
+            return b''
+        return next(self.chunks, b'')
+
+
+def parse_topology_details(chunks):
+    """Incrementally parse a topology detail document, materializing only TOPOLOGY_DETAIL_FIELDS.
+
+    Large members such as the topology configuration are skipped while streaming,
+    so peak memory does not grow with the size of the document.
+    """
+    reader = ChunkReader(chunks)
+    topology = {}
+    field, builder = None, None
+
+    try:
+        for prefix, event, value in ijson.parse(reader, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if prefix == field and event in ('end_map', 'end_array'):
+                    topology[field] = builder.value
+                    field, builder = None, None
+            elif prefix in TOPOLOGY_DETAIL_FIELDS:
+                if event in ('start_map', 'start_array'):
+                    field, builder = prefix, ijson.ObjectBuilder()
+                    builder.event(event, value)
+                else:
+                    topology[prefix] = value
+    except ijson.JSONError as e:
+        raise ValueError(f"Invalid topology details document: {e}") from e
+
+    # Drain the rest of the body so the connection goes back to the pool
+    for _ in reader.chunks:
+        pass
+    return topology
+
+
+def update_executor_metrics(executor, topology_name, topology_id, component_id, samples):
+    labelvalues = (topology_name, topology_id, component_id, executor.get('id', 'N/A'), executor.get('host', 'N/A'), executor.get('port', 'N/A'))
+
+    add_sample(samples, STORM_TOPOLOGY_COMPONENT_EXECUTOR_UPTIME_SECONDS, labelvalues, executor.get('uptimeSeconds'))
+    add_sample(samples, STORM_TOPOLOGY_COMPONENT_EXECUTOR_EMITTED, labelvalues, executor.get('emitted'))
+    add_sample(samples, STORM_TOPOLOGY_COMPONENT_EXECUTOR_TRANSFERRED, labelvalues, executor.get('transferred'))
+    add_sample(samples, STORM_TOPOLOGY_COMPONENT_EXECUTOR_ACKED, labelvalues, executor.get('acked'))
+    add_sample(samples, STORM_TOPOLOGY_COMPONENT_EXECUTOR_FAILED, labelvalues, executor.get('failed'))
+    if 'capacity' in executor:
+        add_sample(samples, STORM_TOPOLOGY_COMPONENT_EXECUTOR_CAPACITY, labelvalues, executor.get('capacity'))
+        add_sample(samples, STORM_TOPOLOGY_COMPONENT_EXECUTOR_EXECUTE_LATENCY, labelvalues, executor.get('executeLatency'))
+        add_sample(samples, STORM_TOPOLOGY_COMPONENT_EXECUTOR_PROCESS_LATENCY, labelvalues, executor.get('processLatency'))
+    else:
+        add_sample(samples, STORM_TOPOLOGY_COMPONENT_EXECUTOR_COMPLETE_LATENCY, labelvalues, executor.get('completeLatency'))
+
+
+def update_stream_metrics(stream, topology_name, topology_id, component_id, samples):
+    labelvalues = (topology_name, topology_id, component_id, stream.get('stream', 'N/A'))
+
+    add_sample(samples, STORM_TOPOLOGY_COMPONENT_STREAM_EMITTED, labelvalues, stream.get('emitted'))
+    add_sample(samples, STORM_TOPOLOGY_COMPONENT_STREAM_TRANSFERRED, labelvalues, stream.get('transferred'))
+
+
+def update_component_metrics(component, topology_name, topology_id, samples):
+    component_id = component.get('id', 'N/A')
+
+    for executor in component.get('executorStats', []):
+        update_executor_metrics(executor, topology_name, topology_id, component_id, samples)
+    for stream in component.get('outputStats', []):
+        update_stream_metrics(stream, topology_name, topology_id, component_id, samples)
+
+
+def update_supervisor_metrics(supervisor, samples):
+    labelvalues = (supervisor.get('id', 'N/A'), supervisor.get('host', 'N/A'))
 
+    add_sample(samples, STORM_SUPERVISOR_UPTIME_SECONDS, labelvalues, supervisor.get('uptimeSeconds'))
+    add_sample(samples, STORM_SUPERVISOR_SLOTS_TOTAL, labelvalues, supervisor.get('slotsTotal'))
+    add_sample(samples, STORM_SUPERVISOR_SLOTS_USED, labelvalues, supervisor.get('slotsUsed'))
+    add_sample(samples, STORM_SUPERVISOR_TOTAL_MEM, labelvalues, supervisor.get('totalMem'))
+    add_sample(samples, STORM_SUPERVISOR_USED_MEM, labelvalues, supervisor.get('usedMem'))
+    add_sample(samples, STORM_SUPERVISOR_TOTAL_CPU, labelvalues, supervisor.get('totalCpu'))
+    add_sample(samples, STORM_SUPERVISOR_USED_CPU, labelvalues, supervisor.get('usedCpu'))
 
-def update_topology_metrics(topology):
+
+def update_topology_metrics(topology, samples):
     topology_name = topology.get('name', 'N/A')
     topology_id = topology.get('id', 'N/A')
 
     for stat in topology.get('topologyStats', []):
-        update_stats_metrics(stat, topology_name, topology_id)
+        update_stats_metrics(stat, topology_name, topology_id, samples)
     for spout in topology.get('spouts', []):
-        update_spout_metrics(spout, topology_name, topology_id)
+        if CARDINALITY.allow_component(spout.get('spoutId', 'N/A')):
+            update_spout_metrics(spout, topology_name, topology_id, samples)
     for bolt in topology.get('bolts', []):
-        update_bolt_metrics(bolt, topology_name, topology_id)
+        if CARDINALITY.allow_component(bolt.get('boltId', 'N/A')):
+            update_bolt_metrics(bolt, topology_name, topology_id, samples)
+
+
+def fetch_error_type(error):
+    """Classify a failed Storm UI request for STORM_EXPORTER_FETCH_ERRORS."""
+    if isinstance(error, requests.exceptions.Timeout):
+        return 'timeout'
+    # Read timeouts while streaming a body are raised as a ConnectionError wrapping the urllib3 error
+    if isinstance(error, requests.exceptions.ConnectionError) and any(isinstance(arg, ReadTimeoutError) for arg in error.args):
+        return 'timeout'
+    if isinstance(error, requests.exceptions.HTTPError):
+        return 'http'
+    if isinstance(error, InvalidContentTypeError):
+        return 'content_type'
+    if isinstance(error, ValueError):
+        return 'parse'
+    return 'connection'
+
+
+def check_content_type(response, description):
+    content_type = response.headers.get('Content-Type', '')
+    if not content_type or 'application/json' not in content_type:
+        raise InvalidContentTypeError(f"Invalid response format from Storm UI for {description}")
+
+
+def get_storm_ui_json(storm_ui_host, path, endpoint=None, cluster=''):
+    """Fetch a Storm UI REST endpoint, raising ValueError on a non-JSON response."""
+    with STORM_EXPORTER_REQUEST_DURATION_SECONDS.labels(cluster, endpoint or path).time():
+        response = HTTP_SESSION.get(f'http://{storm_ui_host}{path}', timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    check_content_type(response, path)
+    return response.json()
 
 
-def collect_topology_summary_metrics(topology_summary, storm_ui_host):
+def get_topology_details(storm_ui_host, topology_id, cluster=''):
+    """Stream /api/v1/topology/{id}, raising ValueError on a non-JSON response."""
+    # Only the wait for Storm UI is timed, the streamed body is read while parsing
+    with STORM_EXPORTER_REQUEST_DURATION_SECONDS.labels(cluster, TOPOLOGY_DETAILS_ENDPOINT).time():
+        response = HTTP_SESSION.get(f'http://{storm_ui_host}/api/v1/topology/{topology_id}', timeout=HTTP_TIMEOUT, stream=True)
+    with response:
+        response.raise_for_status()
+        check_content_type(response, f'topology {topology_id}')
+        return parse_topology_details(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+
+
+def collect_topology_summary_metrics(topology_summary, storm_ui_host, snapshot):
+    topology_name = topology_summary.get('name', 'N/A')
+    topology_id = topology_summary.get('id', 'N/A')
+
+    samples = []
+
+    add_sample(samples, STORM_TOPOLOGY_UPTIME_SECONDS, (topology_name, topology_id), topology_summary.get('uptimeSeconds'))
+    add_sample(samples, STORM_TOPOLOGY_TASKS_TOTAL, (topology_name, topology_id), topology_summary.get('tasksTotal'))
+    add_sample(samples, STORM_TOPOLOGY_WORKERS_TOTAL, (topology_name, topology_id), topology_summary.get('workersTotal'))
+    add_sample(samples, STORM_TOPOLOGY_EXECUTORS_TOTAL, (topology_name, topology_id), topology_summary.get('executorsTotal'))
+    add_sample(samples, STORM_TOPOLOGY_REPLICATION_COUNT, (topology_name, topology_id), topology_summary.get('replicationCount'))
+    add_sample(samples, STORM_TOPOLOGY_REQUESTED_MEM_ON_HEAP, (topology_name, topology_id), topology_summary.get('requestedMemOnHeap'))
+    add_sample(samples, STORM_TOPOLOGY_REQUESTED_MEM_OFF_HEAP, (topology_name, topology_id), topology_summary.get('requestedMemOffHeap'))
+    add_sample(samples, STORM_TOPOLOGY_REQUESTED_TOTAL_MEM, (topology_name, topology_id), topology_summary.get('requestedTotalMem'))
+    add_sample(samples, STORM_TOPOLOGY_REQUESTED_CPU, (topology_name, topology_id), topology_summary.get('requestedCpu'))
+    add_sample(samples, STORM_TOPOLOGY_ASSIGNED_MEM_ON_HEAP, (topology_name, topology_id), topology_summary.get('assignedMemOnHeap'))
+    add_sample(samples, STORM_TOPOLOGY_ASSIGNED_MEM_OFF_HEAP, (topology_name, topology_id), topology_summary.get('assignedMemOffHeap'))
+    add_sample(samples, STORM_TOPOLOGY_ASSIGNED_TOTAL_MEM, (topology_name, topology_id), topology_summary.get('assignedTotalMem'))
+    add_sample(samples, STORM_TOPOLOGY_ASSIGNED_CPU, (topology_name, topology_id), topology_summary.get('assignedCpu'))
+    fetched = time.time()
+
+    adaptive_poller = get_adaptive_poller(snapshot.cluster)
+    if adaptive_poller.should_poll(topology_summary):
+        try:
+            logging.info(f"Fetching detailed metrics for topology {topology_name}")
+            topology_data = get_topology_details(storm_ui_host, topology_id, snapshot.cluster)
+            detail_samples = []
+            update_topology_metrics(topology_data, detail_samples)
+            snapshot.add((topology_id, 'detail'), derive_counters(detail_samples, snapshot.cluster))
+            adaptive_poller.record(topology_summary, topology_data)
+        except (requests.RequestException, ValueError) as e:
+            STORM_EXPORTER_FETCH_ERRORS.labels(snapshot.cluster, TOPOLOGY_DETAILS_ENDPOINT, topology_name, fetch_error_type(e)).inc()
+            if isinstance(e, requests.exceptions.Timeout):
+                logging.error(f"Timeout fetching topology {topology_id} details")
+            else:
+                logging.error(f"Error fetching topology {topology_id} details: {e}")
+    else:
+        logging.debug(f"Skipping idle topology {topology_name}")
+        snapshot.keep((topology_id, 'detail'))
+
+    # Details kept from an earlier cycle, after an error or for an idle topology, make the topology data older
+    detail_fetched = snapshot.fetched((topology_id, 'detail'))
+    if detail_fetched is not None:
+        add_sample(samples, STORM_TOPOLOGY_DATA_TIMESTAMP_SECONDS, (topology_name, topology_id), min(fetched, detail_fetched))
+    else:
+        # Without any details the topology is not fresh, keep the timestamp it had (if any) so its age keeps growing
+        previous = snapshot.previous.groups.get((topology_id, 'summary'))
+        samples.extend(sample for sample in (previous.samples if previous else ())
+                       if sample[0] is STORM_TOPOLOGY_DATA_TIMESTAMP_SECONDS)
+    snapshot.add((topology_id, 'summary'), samples)
+
+
+def collect_all_topologies_metrics(storm_ui_host, max_concurrent_requests=1, stale_series_cycles=0, cluster=''):
+    with STORM_EXPORTER_CYCLE_DURATION_SECONDS.labels(cluster, 'topologies').time():
+        try:
+            topology_summary = get_storm_ui_json(storm_ui_host, TOPOLOGY_SUMMARY_ENDPOINT, cluster=cluster)
+            logging.info(f"Fetched topology summary from {storm_ui_host} successfully")
+
+            snapshot = SnapshotBuilder(STORM_COLLECTOR.snapshot(cluster))
+
+            # Filtered topologies are never fetched, and their series go away like those of killed topologies
+            topologies = [topology for topology in topology_summary.get('topologies', [])
+                          if CARDINALITY.allow_topology(topology.get('name', 'N/A'))]
+            if max_concurrent_requests > 1 and len(topologies) > 1:
+                # Fetch topology details in parallel so a cycle is bounded by the slowest topology
+                with ThreadPoolExecutor(max_workers=min(max_concurrent_requests, len(topologies))) as executor:
+                    list(executor.map(lambda topology: collect_topology_summary_metrics(topology, storm_ui_host, snapshot), topologies))
+            else:
+                for topology in topologies:
+                    collect_topology_summary_metrics(topology, storm_ui_host, snapshot)
+            get_adaptive_poller(cluster).prune(topology.get('id') for topology in topologies)
+
+            # Only publish after a successful summary fetch, so a Storm UI outage keeps the last data
+            published = snapshot.build(stale_series_cycles, CARDINALITY.max_series_per_topology)
+            STORM_COLLECTOR.publish(published)
+            if COUNTER_TRACKER is not None:
+                COUNTER_TRACKER.prune(published, METRICS)
+            STORM_EXPORTER_LAST_SUCCESSFUL_CYCLE.labels(cluster, 'topologies').set_to_current_time()
+        except (requests.RequestException, ValueError) as e:
+            STORM_EXPORTER_FETCH_ERRORS.labels(cluster, TOPOLOGY_SUMMARY_ENDPOINT, '', fetch_error_type(e)).inc()
+            if isinstance(e, requests.exceptions.Timeout):
+                logging.error(f"Timeout fetching topology summary from {storm_ui_host}")
+            elif isinstance(e, requests.exceptions.HTTPError):
+                logging.error(f"HTTP error while fetching topology summary from {storm_ui_host}: {e}")
+            else:
+                logging.error(f"Error fetching topology summary from {storm_ui_host}: {e}")
+
+    METRICS_CACHE.refresh()
+
+
+# Detail metrics whose third label is the ID of a spout or bolt
+COMPONENT_ID_LABELS = ('spout_id', 'bolt_id')
+
+
+def published_component_ids(topology_id, cluster=''):
+    """Return the spout and bolt IDs of a topology from the topology tier's snapshot, None when it has no details."""
+    group = STORM_COLLECTOR.snapshot(cluster).groups.get((topology_id, 'detail'))
+    if group is None:
+        return None
+    component_ids = {}
+    for metric, labelvalues, _ in group.samples:
+        if len(metric.labelnames) > 2 and metric.labelnames[2] in COMPONENT_ID_LABELS:
+            component_ids.setdefault(labelvalues[2])
+    return list(component_ids)
+
+
+def list_topology_components(topology_summary, storm_ui_host, cluster=''):
     topology_name = topology_summary.get('name', 'N/A')
     topology_id = topology_summary.get('id', 'N/A')
 
-    STORM_TOPOLOGY_UPTIME_SECONDS.labels(topology_name, topology_id).set(get_metric(topology_summary.get('uptimeSeconds')))
-    STORM_TOPOLOGY_TASKS_TOTAL.labels(topology_name, topology_id).set(get_metric(topology_summary.get('tasksTotal')))
-    STORM_TOPOLOGY_WORKERS_TOTAL.labels(topology_name, topology_id).set(get_metric(topology_summary.get('workersTotal')))
-    STORM_TOPOLOGY_EXECUTORS_TOTAL.labels(topology_name, topology_id).set(get_metric(topology_summary.get('executorsTotal')))
-    STORM_TOPOLOGY_REPLICATION_COUNT.labels(topology_name, topology_id).set(get_metric(topology_summary.get('replicationCount')))
-    STORM_TOPOLOGY_REQUESTED_MEM_ON_HEAP.labels(topology_name, topology_id).set(get_metric(topology_summary.get('requestedMemOnHeap')))
-    STORM_TOPOLOGY_REQUESTED_MEM_OFF_HEAP.labels(topology_name, topology_id).set(get_metric(topology_summary.get('requestedMemOffHeap')))
-    STORM_TOPOLOGY_REQUESTED_TOTAL_MEM.labels(topology_name, topology_id).set(get_metric(topology_summary.get('requestedTotalMem')))
-    STORM_TOPOLOGY_REQUESTED_CPU.labels(topology_name, topology_id).set(get_metric(topology_summary.get('requestedCpu')))
-    STORM_TOPOLOGY_ASSIGNED_MEM_ON_HEAP.labels(topology_name, topology_id).set(get_metric(topology_summary.get('assignedMemOnHeap')))
-    STORM_TOPOLOGY_ASSIGNED_MEM_OFF_HEAP.labels(topology_name, topology_id).set(get_metric(topology_summary.get('assignedMemOffHeap')))
-    STORM_TOPOLOGY_ASSIGNED_TOTAL_MEM.labels(topology_name, topology_id).set(get_metric(topology_summary.get('assignedTotalMem')))
-    STORM_TOPOLOGY_ASSIGNED_CPU.labels(topology_name, topology_id).set(get_metric(topology_summary.get('assignedCpu')))
+    # The topology tier already fetched the details, unless a series limit may have truncated them
+    component_ids = None if CARDINALITY.max_series_per_topology > 0 else published_component_ids(topology_id, cluster)
+    if component_ids is None:
+        try:
+            topology_data = get_topology_details(storm_ui_host, topology_id, cluster)
+        except (requests.RequestException, ValueError) as e:
+            STORM_EXPORTER_FETCH_ERRORS.labels(cluster, TOPOLOGY_DETAILS_ENDPOINT, topology_name, fetch_error_type(e)).inc()
+            logging.error(f"Error listing components of topology {topology_id}: {e}")
+            return []
+        component_ids = [spout.get('spoutId') for spout in topology_data.get('spouts', [])]
+        component_ids += [bolt.get('boltId') for bolt in topology_data.get('bolts', [])]
+
+    return [(topology_name, topology_id, component_id) for component_id in component_ids
+            if component_id and CARDINALITY.allow_component(component_id)]
+
+
+def collect_component_metrics(component, storm_ui_host, snapshot):
+    topology_name, topology_id, component_id = component
 
     try:
-        logging.info(f"Fetching detailed metrics for topology {topology_name}")
-        response = requests.get(f'http://{storm_ui_host}/api/v1/topology/{topology_id}', timeout=5)
-        response.raise_for_status()
+        logging.debug(f"Fetching component {component_id} metrics for topology {topology_name}")
+        component_data = get_storm_ui_json(
+            storm_ui_host,
+            f'/api/v1/topology/{topology_id}/component/{quote(component_id, safe="")}',
+            COMPONENT_ENDPOINT,
+            snapshot.cluster)
+        samples = []
+        update_component_metrics(component_data, topology_name, topology_id, samples)
+        snapshot.add((topology_id, 'component', component_id), derive_counters(samples, snapshot.cluster))
+    except (requests.RequestException, ValueError) as e:
+        STORM_EXPORTER_FETCH_ERRORS.labels(snapshot.cluster, COMPONENT_ENDPOINT, topology_name, fetch_error_type(e)).inc()
+        logging.error(f"Error fetching component {component_id} of topology {topology_id}: {e}")
+
+
+def collect_supervisor_metrics(storm_ui_host, snapshot):
+    try:
+        supervisor_summary = get_storm_ui_json(storm_ui_host, SUPERVISOR_SUMMARY_ENDPOINT, cluster=snapshot.cluster)
+        samples = []
+        for supervisor in supervisor_summary.get('supervisors', []):
+            update_supervisor_metrics(supervisor, samples)
+        snapshot.add(('supervisors',), samples)
+    except (requests.RequestException, ValueError) as e:
+        STORM_EXPORTER_FETCH_ERRORS.labels(snapshot.cluster, SUPERVISOR_SUMMARY_ENDPOINT, '', fetch_error_type(e)).inc()
+        logging.error(f"Error fetching supervisor summary: {e}")
 
-        content_type = response.headers.get('Content-Type', '')
-        if not content_type or 'application/json' not in content_type:
-            logging.error(f"Invalid response format from Storm UI for topology {topology_id}")
-            return
 
+def collect_all_components_metrics(storm_ui_host, topology_allowlist, max_concurrent_requests=1, stale_series_cycles=0, cluster=''):
+    """Collect per-executor, per-stream and supervisor metrics for the allowlisted topologies."""
+    with STORM_EXPORTER_CYCLE_DURATION_SECONDS.labels(cluster, 'components').time():
         try:
-            topology_data = response.json()
-            update_topology_metrics(topology_data)
-        except ValueError:
-            logging.error(f"Failed to parse JSON response for topology {topology_id}")
-    except requests.exceptions.Timeout:
-        logging.error(f"Timeout fetching topology {topology_id} details")
-    except requests.RequestException as e:
-        logging.error(f"Error fetching topology {topology_id} details: {e}")
+            topology_summary = get_storm_ui_json(storm_ui_host, TOPOLOGY_SUMMARY_ENDPOINT, cluster=cluster)
+        except (requests.RequestException, ValueError) as e:
+            STORM_EXPORTER_FETCH_ERRORS.labels(cluster, TOPOLOGY_SUMMARY_ENDPOINT, '', fetch_error_type(e)).inc()
+            logging.error(f"Error fetching topology summary for component metrics: {e}")
+            return
+
+        snapshot = SnapshotBuilder(COMPONENT_COLLECTOR.snapshot(cluster))
+        topologies = [topology for topology in topology_summary.get('topologies', [])
+                      if topology.get('name') in topology_allowlist and CARDINALITY.allow_topology(topology.get('name'))]
+
+        with ThreadPoolExecutor(max_workers=max(max_concurrent_requests, 1)) as executor:
+            supervisors = executor.submit(collect_supervisor_metrics, storm_ui_host, snapshot)
+            components = [component
+                          for topology_components in executor.map(lambda topology: list_topology_components(topology, storm_ui_host, cluster), topologies)
+                          for component in topology_components]
+            list(executor.map(lambda component: collect_component_metrics(component, storm_ui_host, snapshot), components))
+            supervisors.result()
+
+        published = snapshot.build(stale_series_cycles, CARDINALITY.max_series_per_topology)
+        COMPONENT_COLLECTOR.publish(published)
+        if COUNTER_TRACKER is not None:
+            COUNTER_TRACKER.prune(published, COMPONENT_METRICS)
+        STORM_EXPORTER_LAST_SUCCESSFUL_CYCLE.labels(cluster, 'components').set_to_current_time()
+
+    METRICS_CACHE.refresh()
+
+
+# Polling settings of one Storm cluster
+ClusterConfig = namedtuple('ClusterConfig', ['name', 'storm_ui_host', 'refresh_rate', 'max_concurrent_requests', 'component_topologies', 'component_refresh_rate'])
+
+
+def parse_topology_names(names):
+    if isinstance(names, str):
+        names = names.split(',')
+    if not isinstance(names, (list, tuple, set, frozenset)) or not all(isinstance(name, str) for name in names):
+        raise ValueError("expected a comma separated string or a list of topology names")
+    return frozenset(name.strip() for name in names if name.strip())
+
+
+# Cluster settings which must be positive integers
+POSITIVE_INT_SETTINGS = ('refresh_rate', 'max_concurrent_requests', 'component_refresh_rate')
 
 
-def collect_all_topologies_metrics(storm_ui_host):
+def validate_cluster_settings(settings):
+    """Coerce and check the values of one cluster's settings, raising ValueError naming the cluster."""
+    cluster = settings.get('name') or settings.get('storm_ui_host')
+    for key in ('name', 'storm_ui_host'):
+        if not isinstance(settings[key], str):
+            raise ValueError(f"Cluster {cluster!r}: {key} must be a string")
+    for key in POSITIVE_INT_SETTINGS:
+        value = settings[key]
+        try:
+            # Booleans and floats are not silently truncated into a number of seconds or requests
+            if isinstance(value, (bool, float)):
+                raise ValueError
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Cluster {cluster!r}: {key} must be an integer, got {settings[key]!r}") from None
+        if value <= 0:
+            raise ValueError(f"Cluster {cluster!r}: {key} must be positive, got {value}")
+        settings[key] = value
     try:
-        response = requests.get(f'http://{storm_ui_host}/api/v1/topology/summary', timeout=5)
-        response.raise_for_status()
-        logging.info("Fetched topology summary successfully")
+        settings['component_topologies'] = parse_topology_names(settings['component_topologies'])
+    except ValueError as e:
+        raise ValueError(f"Cluster {cluster!r}: component_topologies {e}") from None
+    return settings
+
+
+def load_clusters(args):
+    """Build the list of polled clusters from --clusters-file and --cluster, falling back to --storm-ui-host."""
+    defaults = {
+        'name': '',
+        'refresh_rate': args.refresh_rate,
+        'max_concurrent_requests': args.max_concurrent_requests,
+        'component_topologies': args.component_metrics_topologies,
+        'component_refresh_rate': args.component_refresh_rate,
+    }
+
+    entries = []
+    if args.clusters_file:
+        with open(args.clusters_file) as f:
+            clusters_file = json.load(f)
+        if not isinstance(clusters_file, list) or not all(isinstance(entry, dict) for entry in clusters_file):
+            raise ValueError(f"{args.clusters_file} must contain a JSON list of cluster objects")
+        entries.extend(clusters_file)
+    for cluster in args.cluster:
+        name, separator, storm_ui_host = cluster.partition('=')
+        if not separator:
+            raise ValueError(f"Invalid cluster '{cluster}', expected NAME=HOST")
+        entries.append({'name': name.strip(), 'storm_ui_host': storm_ui_host.strip()})
+    if not entries:
+        entries.append({'name': '', 'storm_ui_host': args.storm_ui_host})
+
+    clusters = []
+    for entry in entries:
+        unknown = set(entry) - set(ClusterConfig._fields)
+        if unknown:
+            raise ValueError(f"Unknown cluster settings: {', '.join(sorted(unknown))}")
+        settings = dict(defaults, **entry)
+        if not settings.get('storm_ui_host') or (len(entries) > 1 and not settings.get('name')):
+            raise ValueError(f"Cluster {entry} needs a name and a storm_ui_host")
+        clusters.append(ClusterConfig(**validate_cluster_settings(settings)))
+
+    names = [cluster.name for cluster in clusters]
+    if len(set(names)) != len(names):
+        raise ValueError("Cluster names must be unique")
+    return clusters
+
+
+class PollWorker(threading.Thread):
+    """Run the refresh cycles of one cluster and tier on a dedicated thread.
+
+    A cycle overrunning the refresh rate delays the next one, which then starts
+    right away, instead of dropping it. Start times passed while a cycle was
+    running are coalesced into that one late cycle and counted as skipped.
+    Scrapes never wait for a cycle, they are served from the last published
+    snapshot.
+    """
+
+    # Wait before retrying when the next start time could not be computed
+    RETRY_DELAY = 1
+
+    def __init__(self, cluster, tier, refresh_rate, target, args=()):
+        if not refresh_rate > 0:
+            raise ValueError(f"Refresh rate of {cluster}:{tier} must be positive, got {refresh_rate}")
+        super().__init__(name=f'{cluster}:{tier}', daemon=True)
+        self.cluster = cluster
+        self.tier = tier
+        self.refresh_rate = refresh_rate
+        self.target = target
+        self.args = args
+        self.stopped = threading.Event()
+
+    def run_cycle(self, next_run):
+        """Run one refresh cycle and return the start time of the next one, failures never stop the worker."""
+        try:
+            self.target(*self.args)
+        except Exception:
+            # A failed cycle must not stop the worker, the next one may succeed
+            logging.exception(f"Refresh cycle {self.name} failed")
+        try:
+            return self.schedule_next(next_run, time.monotonic())
+        except Exception:
+            logging.exception(f"Scheduling the next {self.name} refresh cycle failed")
+            return time.monotonic() + self.RETRY_DELAY
 
-        for topology in response.json().get('topologies', []):
-            collect_topology_summary_metrics(topology, storm_ui_host)
-    except requests.exceptions.Timeout:
-        logging.error("Timeout fetching topology summary")
-    except requests.exceptions.HTTPError as http_err:
-        logging.error(f"HTTP error while fetching topology summary: {http_err}")
-    except requests.RequestException as e:
-        logging.error(f"Error fetching topology summary: {e}")
+    def schedule_next(self, next_run, now):
+        """Return the start time of the next cycle, counting the cycles delayed or skipped by an overrun."""
+        next_run += self.refresh_rate
+        if now <= next_run:
+            return next_run
+        skipped = int((now - next_run) // self.refresh_rate)
+        STORM_EXPORTER_DELAYED_CYCLES.labels(self.cluster, self.tier).inc()
+        if skipped:
+            STORM_EXPORTER_SKIPPED_CYCLES.labels(self.cluster, self.tier).inc(skipped)
+        logging.warning(f"Refresh cycle {self.name} took longer than {self.refresh_rate} seconds, skipped {skipped} cycles")
+        return now
+
+    def run(self):
+        next_run = time.monotonic()
+        while not self.stopped.is_set():
+            next_run = self.run_cycle(next_run)
+            self.stopped.wait(max(next_run - time.monotonic(), 0))
+
+    def stop(self):
+        self.stopped.set()
+
+
+def positive_int(value):
+    """argparse type for settings that must be a positive number, e.g. refresh rates."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be positive, got {number}")
+    return number
 
 
 def main():
@@ -168,15 +1249,94 @@ def main():
         '--storm-ui-host',
         default=os.environ.get('STORM_UI_HOST', 'localhost:8080'),
         help='Storm UI host')
+    parser.add_argument(
+        '--cluster',
+        action='append',
+        help='Storm cluster to poll as NAME=HOST, can be repeated (overrides --storm-ui-host and STORM_CLUSTERS)')
+    parser.add_argument(
+        '--clusters-file',
+        default=os.environ.get('CLUSTERS_FILE'),
+        help='JSON file with a list of Storm clusters to poll (overrides --storm-ui-host)')
     parser.add_argument(
         '--exporter-http-port',
         type=int,
         default=int(os.environ.get('EXPORTER_HTTP_PORT', 9800)),
         help='HTTP port for Prometheus exporter')
     parser.add_argument(
-        '--refresh-rate', type=int,
-        default=int(os.environ.get('REFRESH_RATE', 15)),
+        '--refresh-rate', type=positive_int,
+        default=os.environ.get('REFRESH_RATE', '15'),
         help='Metrics refresh rate in seconds')
+    parser.add_argument(
+        '--max-concurrent-requests', type=int,
+        default=int(os.environ.get('MAX_CONCURRENT_REQUESTS', 4)),
+        help='Maximum number of topology details fetched from Storm UI in parallel')
+    parser.add_argument(
+        '--http-pool-size', type=int,
+        default=int(os.environ.get('HTTP_POOL_SIZE', 0)),
+        help='Number of keep-alive connections kept open per Storm UI (defaults to the highest max_concurrent_requests of all clusters, doubled for clusters collecting component metrics)')
+    parser.add_argument(
+        '--connect-timeout', type=float,
+        default=float(os.environ.get('CONNECT_TIMEOUT', 5)),
+        help='Storm UI connect timeout in seconds')
+    parser.add_argument(
+        '--read-timeout', type=float,
+        default=float(os.environ.get('READ_TIMEOUT', 5)),
+        help='Storm UI read timeout in seconds')
+    parser.add_argument(
+        '--stale-series-cycles', type=int,
+        default=int(os.environ.get('STALE_SERIES_CYCLES', 3)),
+        help='Remove series not updated for this many refresh cycles (0 keeps them forever)')
+    parser.add_argument(
+        '--idle-refresh-rate', type=int,
+        default=int(os.environ.get('IDLE_REFRESH_RATE', 0)),
+        help='Refresh rate in seconds for the details of idle or non-ACTIVE topologies (0 refreshes every topology on every cycle)')
+    parser.add_argument(
+        '--busy-capacity', type=float,
+        default=float(os.environ.get('BUSY_CAPACITY', 0.8)),
+        help='Bolt capacity from which a topology is always refreshed at the full rate')
+    parser.add_argument(
+        '--stats-mode',
+        default=os.environ.get('STATS_MODE', 'windows'),
+        choices=['windows', 'counters'],
+        help='Export message counts as one gauge per Storm window (windows) or as all-time counters (counters)')
+    parser.add_argument(
+        '--export-rates',
+        action='store_true',
+        default=os.environ.get('EXPORT_RATES', '').lower() in ('1', 'true', 'yes'),
+        help='In counters mode, also export a *_rate gauge with the per-second rate of every counter')
+    parser.add_argument(
+        '--topology-include',
+        default=os.environ.get('TOPOLOGY_INCLUDE'),
+        help='Only export topologies whose name matches this regular expression')
+    parser.add_argument(
+        '--topology-exclude',
+        default=os.environ.get('TOPOLOGY_EXCLUDE'),
+        help='Do not export topologies whose name matches this regular expression')
+    parser.add_argument(
+        '--component-include',
+        default=os.environ.get('COMPONENT_INCLUDE'),
+        help='Only export spouts and bolts whose ID matches this regular expression')
+    parser.add_argument(
+        '--component-exclude',
+        default=os.environ.get('COMPONENT_EXCLUDE'),
+        help='Do not export spouts and bolts whose ID matches this regular expression')
+    parser.add_argument(
+        '--drop-topology-id',
+        action='store_true',
+        default=os.environ.get('DROP_TOPOLOGY_ID', '').lower() in ('1', 'true', 'yes'),
+        help='Identify topologies by topology_name only, so series survive redeploys')
+    parser.add_argument(
+        '--max-series-per-topology', type=int,
+        default=int(os.environ.get('MAX_SERIES_PER_TOPOLOGY', 0)),
+        help='Drop series beyond this number per topology and tier (0 disables the limit)')
+    parser.add_argument(
+        '--component-metrics-topologies',
+        default=os.environ.get('COMPONENT_METRICS_TOPOLOGIES', ''),
+        help='Comma separated topology names to collect per-executor, per-stream and supervisor metrics for (disabled when empty)')
+    parser.add_argument(
+        '--component-refresh-rate', type=positive_int,
+        default=os.environ.get('COMPONENT_REFRESH_RATE', '60'),
+        help='Component metrics refresh rate in seconds')
     parser.add_argument(
         '--log-level',
         default=os.environ.get('LOG_LEVEL', 'INFO'),
@@ -184,33 +1344,78 @@ def main():
         help='Logging level')
 
     args = parser.parse_args()
+    # Flags replace the clusters from the environment instead of adding to them
+    if args.cluster is None:
+        args.cluster = [cluster for cluster in os.environ.get('STORM_CLUSTERS', '').split(',') if cluster]
 
     # Configure logging
     logging.basicConfig(
         level=getattr(logging, args.log_level.upper(), logging.INFO),
         format='%(asctime)s - %(levelname)s - %(message)s')
 
-    logging.info(f"Starting Storm Metrics Exporter on port {args.exporter_http_port}, polling {args.storm_ui_host} every {args.refresh_rate} seconds")
+    try:
+        clusters = load_clusters(args)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    try:
+        configure_cardinality(
+            topology_include=args.topology_include,
+            topology_exclude=args.topology_exclude,
+            component_include=args.component_include,
+            component_exclude=args.component_exclude,
+            drop_topology_id=args.drop_topology_id,
+            max_series_per_topology=args.max_series_per_topology)
+    except re.error as e:
+        parser.error(f"Invalid filter pattern: {e}")
+
+    logging.info(f"Starting Storm Metrics Exporter on port {args.exporter_http_port}")
+
+    configure_adaptive_polling(args.idle_refresh_rate, args.busy_capacity)
+    configure_stats_mode(args.stats_mode, args.export_rates)
+
+    # The component tier gets its own share of connections so it never starves the core poll
+    pool_size = max(max(cluster.max_concurrent_requests, 1) * (2 if cluster.component_topologies else 1) for cluster in clusters)
+    configure_http_session(
+        args.http_pool_size or pool_size,
+        args.connect_timeout,
+        args.read_timeout,
+        len(clusters))
 
     try:
-        start_http_server(args.exporter_http_port)
+        start_metrics_server(args.exporter_http_port)
     except Exception as e:
         logging.error(f"Failed to start HTTP server on port {args.exporter_http_port}: {e}")
         return
 
-    scheduler = BlockingScheduler()
-    scheduler.add_job(
-        collect_all_topologies_metrics,
-        'interval',
-        seconds=args.refresh_rate,
-        args=[args.storm_ui_host],  # Pass the arguments to the function
-        max_instances=1,
-        coalesce=True)
+    # One worker per cluster and tier, so a slow cluster never delays the others
+    workers = []
+    for cluster in clusters:
+        logging.info(f"Polling {cluster.name or 'Storm UI'} at {cluster.storm_ui_host} every {cluster.refresh_rate} seconds")
+        workers.append(PollWorker(
+            cluster.name,
+            'topologies',
+            cluster.refresh_rate,
+            collect_all_topologies_metrics,
+            (cluster.storm_ui_host, cluster.max_concurrent_requests, args.stale_series_cycles, cluster.name)))
+        if cluster.component_topologies:
+            logging.info(f"Collecting component metrics for {', '.join(sorted(cluster.component_topologies))} every {cluster.component_refresh_rate} seconds")
+            workers.append(PollWorker(
+                cluster.name,
+                'components',
+                cluster.component_refresh_rate,
+                collect_all_components_metrics,
+                (cluster.storm_ui_host, cluster.component_topologies, cluster.max_concurrent_requests, args.stale_series_cycles, cluster.name)))
 
+    for worker in workers:
+        worker.start()
     try:
-        scheduler.start()
+        for worker in workers:
+            worker.join()
     except (KeyboardInterrupt, SystemExit):
         logging.info("Stopping Storm Metrics Exporter...")
+        for worker in workers:
+            worker.stop()
 
 
 if __name__ == '__main__':
@@ -2,12 +2,19 @@
 # -*- coding: utf-8 -*-
 
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, ANY
+import argparse
+import json
+import os
+import requests
+import urllib3
+import tempfile
+import benchmark_storm_exporter
 import storm_exporter
 import logging
 
 class TestStormExporter(unittest.TestCase):
-    @patch('storm_exporter.requests.get')
+    @patch('storm_exporter.HTTP_SESSION.get')
     def test_get_metric(self, mock_get):
         # Test valid metric: Ensure the function returns the same value for a valid input
         self.assertEqual(storm_exporter.get_metric(10), 10)
@@ -21,7 +28,7 @@ class TestStormExporter(unittest.TestCase):
         # Test float value: Ensure a float is correctly handled
         self.assertEqual(storm_exporter.get_metric(12.34), 12.34)
 
-    @patch('storm_exporter.requests.get')
+    @patch('storm_exporter.HTTP_SESSION.get')
     def test_update_stats_metrics(self, mock_get):
         # Setup mock response for the stat values
         mock_stat = {
@@ -33,18 +40,16 @@ class TestStormExporter(unittest.TestCase):
             'failed': 5
         }
 
-        # Mock the Prometheus Gauge's 'labels' method for STORM_TOPOLOGY_STATS_TRANSFERRED
-        with patch('storm_exporter.STORM_TOPOLOGY_STATS_TRANSFERRED.labels') as mock_labels:
-            mock_gauge = MagicMock()  # Mock the Gauge object
-            mock_labels.return_value = mock_gauge  # Return the mocked Gauge when 'labels' is called
+        # Call the function to test
+        samples = []
+        storm_exporter.update_stats_metrics(mock_stat, 'topology_name', 'topology_id', samples)
 
-            # Call the function to test
-            storm_exporter.update_stats_metrics(mock_stat, 'topology_name', 'topology_id')
+        # Verify that the transferred sample carries the expected labels and value (100)
+        self.assertIn(
+            (storm_exporter.STORM_TOPOLOGY_STATS_TRANSFERRED, ('topology_name', 'topology_id', 'test_window'), 100.0),
+            samples)
 
-            # Verify that the 'set' method on the mock Gauge is called with the expected value (100)
-            mock_gauge.set.assert_called_with(100)
-
-    @patch('storm_exporter.requests.get')
+    @patch('storm_exporter.HTTP_SESSION.get')
     def test_collect_topology_summary_metrics(self, mock_get):
         # Mock topology summary response with sample data
         mock_topology_summary = {
@@ -71,30 +76,17 @@ class TestStormExporter(unittest.TestCase):
         mock_response.headers = {'Content-Type': 'application/json'}
         mock_get.return_value = mock_response
 
-        # Mock Prometheus Gauges for uptime, tasks, and workers
-        with patch('storm_exporter.STORM_TOPOLOGY_UPTIME_SECONDS.labels') as mock_uptime, \
-            patch('storm_exporter.STORM_TOPOLOGY_TASKS_TOTAL.labels') as mock_tasks_total, \
-            patch('storm_exporter.STORM_TOPOLOGY_WORKERS_TOTAL.labels') as mock_workers_total:
-
-            # Simulate the return value of each 'labels' call to return a mock Gauge object
-            mock_uptime_gauge = MagicMock()
-            mock_tasks_total_gauge = MagicMock()
-            mock_workers_total_gauge = MagicMock()
-
-            # Assign the mock Gauge objects to the return values of labels
-            mock_uptime.return_value = mock_uptime_gauge
-            mock_tasks_total.return_value = mock_tasks_total_gauge
-            mock_workers_total.return_value = mock_workers_total_gauge
+        # Call the function under test to collect the metrics
+        snapshot = storm_exporter.SnapshotBuilder(storm_exporter.StormCollector().snapshot())
+        storm_exporter.collect_topology_summary_metrics(mock_topology_summary, 'localhost', snapshot)
 
-            # Call the function under test to collect the metrics
-            storm_exporter.collect_topology_summary_metrics(mock_topology_summary, 'localhost')
+        # Verify that the summary samples were added with the expected values
+        summary = {metric.name: value for metric, _, value in snapshot.groups[('topology_id', 'summary')].samples}
+        self.assertEqual(summary['storm_topology_uptime_seconds'], 100)
+        self.assertEqual(summary['storm_topology_tasks_total'], 5)
+        self.assertEqual(summary['storm_topology_workers_total'], 3)
 
-            # Verify that the 'set' method on each mock Gauge was called with the expected values
-            mock_uptime_gauge.set.assert_called_with(100)
-            mock_tasks_total_gauge.set.assert_called_with(5)
-            mock_workers_total_gauge.set.assert_called_with(3)
-
-    @patch('storm_exporter.requests.get')
+    @patch('storm_exporter.HTTP_SESSION.get')
     def test_collect_all_topologies_metrics(self, mock_get):
         # Mock topology summary response
         mock_topology_summary = {
@@ -125,9 +117,27 @@ class TestStormExporter(unittest.TestCase):
             # Call the function to collect all topology metrics
             storm_exporter.collect_all_topologies_metrics('localhost')
             # Verify that the function 'collect_topology_summary_metrics' was called with the expected arguments
-            mock_collect_metrics.assert_called_once_with(mock_topology_summary, 'localhost')
+            mock_collect_metrics.assert_called_once_with(mock_topology_summary, 'localhost', ANY)
+
+    @patch('storm_exporter.HTTP_SESSION.get')
+    def test_collect_all_topologies_metrics_concurrently(self, mock_get):
+        # Mock topology summary response with several topologies
+        mock_topologies = [{'name': f'topology_{i}', 'id': f'topology_{i}-1-1'} for i in range(5)]
+
+        mock_response = MagicMock()
+        mock_response.json.return_value = {'topologies': mock_topologies}
+        mock_response.headers = {'Content-Type': 'application/json'}
+        mock_get.return_value = mock_response
 
-    @patch('storm_exporter.requests.get')
+        with patch('storm_exporter.collect_topology_summary_metrics') as mock_collect_metrics:
+            # Call the function with a bounded thread pool
+            storm_exporter.collect_all_topologies_metrics('localhost', max_concurrent_requests=3)
+            # Verify that every topology was collected exactly once
+            self.assertEqual(mock_collect_metrics.call_count, len(mock_topologies))
+            for topology in mock_topologies:
+                mock_collect_metrics.assert_any_call(topology, 'localhost', ANY)
+
+    @patch('storm_exporter.HTTP_SESSION.get')
     def test_fetch_topology_details(self, mock_get):
         # Mock detailed topology data response
         mock_topology_data = {
@@ -138,15 +148,486 @@ class TestStormExporter(unittest.TestCase):
 
         # Mock the HTTP GET request to return the mock topology data
         mock_response = MagicMock()
-        mock_response.json.return_value = mock_topology_data
+        mock_response.iter_content.return_value = [json.dumps(mock_topology_data).encode()]
         mock_response.headers = {'Content-Type': 'application/json'}
         mock_get.return_value = mock_response
 
         with patch('storm_exporter.update_topology_metrics') as mock_update_metrics:
             # Call the function to fetch and update topology metrics
-            storm_exporter.collect_topology_summary_metrics(mock_topology_data, 'localhost')
+            snapshot = storm_exporter.SnapshotBuilder(storm_exporter.StormCollector().snapshot())
+            storm_exporter.collect_topology_summary_metrics(mock_topology_data, 'localhost', snapshot)
             # Verify that the 'update_topology_metrics' function was called with the expected data
-            mock_update_metrics.assert_called_once_with(mock_topology_data)
+            mock_update_metrics.assert_called_once_with(mock_topology_data, ANY)
+
+    @patch('storm_exporter.HTTP_SESSION.get')
+    def test_collect_all_components_metrics(self, mock_get):
+        payloads = {
+            '/api/v1/topology/summary': {'topologies': [
+                {'name': 'wordcount', 'id': 'wordcount-1-1'},
+                {'name': 'ignored', 'id': 'ignored-1-1'}]},
+            '/api/v1/topology/wordcount-1-1': {'spouts': [{'spoutId': 'spout'}], 'bolts': [{'boltId': 'count'}]},
+            '/api/v1/topology/wordcount-1-1/component/spout': {
+                'id': 'spout',
+                'executorStats': [{'id': '[1-1]', 'host': 'worker-1', 'port': 6700, 'emitted': 10, 'completeLatency': 2}],
+                'outputStats': [{'stream': 'default', 'emitted': 10, 'transferred': 10}]},
+            '/api/v1/topology/wordcount-1-1/component/count': {
+                'id': 'count',
+                'executorStats': [{'id': '[2-2]', 'host': 'worker-1', 'port': 6700, 'capacity': 0.75, 'executeLatency': 1.5}]},
+            '/api/v1/supervisor/summary': {'supervisors': [{'id': 'sup-1', 'host': 'worker-1', 'slotsTotal': 4, 'slotsUsed': 1}]},
+        }
+
+        def get(url, timeout, stream=False):
+            payload = payloads[url.replace('http://localhost', '')]
+            mock_response = MagicMock()
+            mock_response.json.return_value = payload
+            mock_response.iter_content.return_value = [json.dumps(payload).encode()]
+            mock_response.headers = {'Content-Type': 'application/json'}
+            return mock_response
+        mock_get.side_effect = get
+
+        core_collector = storm_exporter.StormCollector()
+        with patch('storm_exporter.STORM_COLLECTOR', core_collector), \
+                patch('storm_exporter.COMPONENT_COLLECTOR', storm_exporter.StormCollector(storm_exporter.COMPONENT_METRICS)) as collector:
+            storm_exporter.collect_all_components_metrics('localhost', {'wordcount'}, max_concurrent_requests=2)
+            families = {family.name: family.samples for family in collector.collect()}
+
+            # Verify that only the allowlisted topology was fetched
+            requested = {call.args[0] for call in mock_get.call_args_list}
+            self.assertNotIn('http://localhost/api/v1/topology/ignored-1-1', requested)
+            self.assertIn('http://localhost/api/v1/topology/wordcount-1-1', requested)
+
+            # Once the topology tier published the details, components are listed without fetching them again
+            snapshot = storm_exporter.SnapshotBuilder(core_collector.snapshot())
+            samples = []
+            storm_exporter.update_topology_metrics(payloads['/api/v1/topology/wordcount-1-1'], samples)
+            snapshot.add(('wordcount-1-1', 'detail'), samples)
+            core_collector.publish(snapshot.build())
+            mock_get.reset_mock()
+            storm_exporter.collect_all_components_metrics('localhost', {'wordcount'})
+            requested = [call.args[0] for call in mock_get.call_args_list]
+            self.assertNotIn('http://localhost/api/v1/topology/wordcount-1-1', requested)
+            self.assertIn('http://localhost/api/v1/topology/wordcount-1-1/component/count', requested)
+
+        # Verify executor, stream and supervisor samples
+        capacity = families['storm_topology_component_executor_capacity'][0]
+        self.assertEqual(capacity.labels['executor_id'], '[2-2]')
+        self.assertEqual(capacity.labels['port'], '6700')
+        self.assertEqual(capacity.value, 0.75)
+        self.assertEqual(families['storm_topology_component_stream_emitted'][0].value, 10)
+        self.assertEqual(families['storm_supervisor_slots_used'][0].value, 1)
+
+    @patch('storm_exporter.HTTP_SESSION.get')
+    def test_self_instrumentation(self, mock_get):
+        def sample(name, **labels):
+            return storm_exporter.REGISTRY.get_sample_value(name, labels) or 0
+
+        summary_response = MagicMock()
+        summary_response.json.return_value = {'topologies': [{'name': 'slow_topology', 'id': 'slow_topology-1-1'}]}
+        summary_response.headers = {'Content-Type': 'application/json'}
+
+        def get(url, timeout, stream=False):
+            if url.endswith('/summary'):
+                return summary_response
+            raise requests.exceptions.Timeout()
+        mock_get.side_effect = get
+
+        errors = {'cluster': '', 'endpoint': '/api/v1/topology/{id}', 'topology_name': 'slow_topology', 'error': 'timeout'}
+        timeouts = sample('storm_exporter_fetch_errors_total', **errors)
+        cycles = sample('storm_exporter_cycle_duration_seconds_count', cluster='', tier='topologies')
+        requests_made = sample('storm_exporter_request_duration_seconds_count', cluster='', endpoint='/api/v1/topology/summary')
+
+        with patch('storm_exporter.STORM_COLLECTOR', storm_exporter.StormCollector()):
+            storm_exporter.collect_all_topologies_metrics('localhost')
+
+        # Verify that the timeout, the cycle and the summary request were recorded
+        self.assertEqual(sample('storm_exporter_fetch_errors_total', **errors), timeouts + 1)
+        self.assertEqual(sample('storm_exporter_cycle_duration_seconds_count', cluster='', tier='topologies'), cycles + 1)
+        self.assertEqual(sample('storm_exporter_request_duration_seconds_count', cluster='', endpoint='/api/v1/topology/summary'), requests_made + 1)
+        self.assertGreater(sample('storm_exporter_last_successful_cycle_timestamp_seconds', cluster='', tier='topologies'), 0)
+
+        # A non-JSON summary is counted as a content type error
+        summary_response.headers = {'Content-Type': 'text/html'}
+        errors = {'cluster': '', 'endpoint': '/api/v1/topology/summary', 'topology_name': '', 'error': 'content_type'}
+        content_type_errors = sample('storm_exporter_fetch_errors_total', **errors)
+        storm_exporter.collect_all_topologies_metrics('localhost')
+        self.assertEqual(sample('storm_exporter_fetch_errors_total', **errors), content_type_errors + 1)
+
+    def test_collect_against_fake_storm_ui(self):
+        payloads = benchmark_storm_exporter.synthetic_payloads(topologies=3, spouts=1, bolts=2, executors=2, config_keys=10)
+        fake_storm_ui = benchmark_storm_exporter.FakeStormUI(payloads).start()
+        self.addCleanup(fake_storm_ui.server_close)
+        self.addCleanup(fake_storm_ui.shutdown)
+
+        # Run a full cycle over real HTTP, including gzip and streamed detail parsing
+        with patch('storm_exporter.STORM_COLLECTOR', storm_exporter.StormCollector()) as collector:
+            storm_exporter.collect_all_topologies_metrics(fake_storm_ui.storm_ui_host, max_concurrent_requests=2)
+            families = {family.name: family.samples for family in collector.collect()}
+
+        # Verify that every topology, spout and bolt was exported
+        self.assertEqual(len(families['storm_topology_uptime_seconds']), 3)
+        self.assertEqual(len(families['storm_topology_stats_acked']), 3 * 4)
+        self.assertEqual(len(families['storm_topology_spouts_emitted']), 3)
+        self.assertEqual(len(families['storm_topology_bolts_capacity']), 3 * 2)
+
+    def test_parse_topology_details(self):
+        document = json.dumps({
+            'id': 'topology_id',
+            'name': 'topology_name',
+            'configuration': {f'topology.option.{i}': 'x' * 100 for i in range(1000)},
+            'topologyStats': [{'window': '600', 'acked': 90, 'completeLatency': '1.250'}],
+            'spouts': [{'spoutId': 'spout_1', 'emitted': 100}],
+            'bolts': [{'boltId': 'bolt_1', 'capacity': '0.010', 'inputs': [{'component': 'spout_1'}]}],
+            'workers': [{'host': 'worker-1', 'port': 6700}],
+        }).encode()
+
+        # Feed the document in small chunks to exercise the incremental parser
+        chunks = [document[i:i + 1024] for i in range(0, len(document), 1024)]
+        topology = storm_exporter.parse_topology_details(chunks)
+
+        # Verify that only the mapped members were materialized
+        self.assertEqual(set(topology), {'id', 'name', 'topologyStats', 'spouts', 'bolts'})
+        self.assertEqual(topology['topologyStats'][0]['acked'], 90)
+        self.assertEqual(topology['bolts'][0]['inputs'], [{'component': 'spout_1'}])
+
+        # Truncated documents are reported as ValueError
+        with self.assertRaises(ValueError):
+            storm_exporter.parse_topology_details([document[:100]])
+
+    def test_adaptive_poller(self):
+        poller = storm_exporter.AdaptivePoller(idle_refresh_rate=60, busy_capacity=0.8)
+        summary = {'id': 'topology_id', 'status': 'ACTIVE', 'uptimeSeconds': 100, 'tasksTotal': 5}
+        idle_data = {'topologyStats': [{'window': '600', 'emitted': 0, 'acked': 0, 'failed': 0}],
+                     'bolts': [{'boltId': 'bolt_1', 'capacity': '0.010'}]}
+
+        # Unknown topologies are always polled
+        self.assertTrue(poller.should_poll(summary, now=0))
+
+        # A topology whose stats did not move is only polled every idle_refresh_rate seconds
+        poller.record(summary, idle_data, now=0)
+        poller.record(summary, idle_data, now=15)
+        self.assertFalse(poller.should_poll(summary, now=30))
+        self.assertTrue(poller.should_poll(summary, now=75))
+
+        # A restart or layout change is polled immediately
+        self.assertTrue(poller.should_poll(dict(summary, uptimeSeconds=10), now=30))
+        self.assertTrue(poller.should_poll(dict(summary, tasksTotal=6), now=30))
+
+        # A topology with a hot bolt stays at the full rate
+        busy_data = dict(idle_data, bolts=[{'boltId': 'bolt_1', 'capacity': '0.950'}])
+        poller.record(summary, busy_data, now=45)
+        self.assertTrue(poller.should_poll(summary, now=60))
+
+    def test_snapshot_evicts_stale_groups(self):
+        collector = storm_exporter.StormCollector()
+        metric = storm_exporter.STORM_TOPOLOGY_UPTIME_SECONDS
+
+        def publish_cycle(*topologies):
+            snapshot = storm_exporter.SnapshotBuilder(collector.snapshot())
+            for name in topologies:
+                snapshot.add((name, 'summary'), [(metric, (name, f'{name}-1-1'), 100.0)])
+            collector.publish(snapshot.build(2))
+
+        def exported_topologies():
+            families = {family.name: family for family in collector.collect()}
+            return {sample.labels['topology_name'] for sample in families['storm_topology_uptime_seconds'].samples}
+
+        # Both topologies are seen in the first cycle
+        publish_cycle('alive', 'killed')
+        self.assertEqual(exported_topologies(), {'alive', 'killed'})
+
+        # The killed topology is kept after one missed cycle
+        publish_cycle('alive')
+        self.assertEqual(exported_topologies(), {'alive', 'killed'})
+
+        # And removed after two missed cycles
+        publish_cycle('alive')
+        self.assertEqual(exported_topologies(), {'alive'})
+
+    def test_metrics_server_serves_cached_exposition(self):
+        server = storm_exporter.start_metrics_server(0, addr='127.0.0.1')
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f'http://127.0.0.1:{server.server_port}/metrics'
+        storm_exporter.METRICS_CACHE.refresh()
+        exposition = storm_exporter.METRICS_CACHE.exposition
+
+        # Plain text response carries the cached body and its ETag
+        response = requests.get(url, headers={'Accept-Encoding': 'identity'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, exposition.body)
+        self.assertEqual(response.headers['ETag'], exposition.etag)
+
+        # Gzip response decodes to the same body
+        response = requests.get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.content, exposition.body)
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.headers['ETag'], exposition.gzip_etag)
+
+        # HEAD probes get the headers without a body
+        response = requests.head(url, headers={'Accept-Encoding': 'identity'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Length'], str(len(exposition.body)))
+        self.assertEqual(response.content, b'')
+
+        # Unchanged exposition is answered with 304, validators only match their own content coding
+        response = requests.get(url, headers={'Accept-Encoding': 'identity', 'If-None-Match': exposition.etag})
+        self.assertEqual(response.status_code, 304)
+        response = requests.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': exposition.etag})
+        self.assertEqual(response.status_code, 200)
+        response = requests.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': exposition.gzip_etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_collector_merges_clusters(self):
+        collector = storm_exporter.StormCollector()
+        metric = storm_exporter.STORM_TOPOLOGY_UPTIME_SECONDS
+
+        # Publish one snapshot per cluster
+        for cluster in ('prod', 'staging'):
+            snapshot = storm_exporter.SnapshotBuilder(collector.snapshot(cluster))
+            snapshot.add(('wordcount-1-1', 'summary'), [(metric, ('wordcount', 'wordcount-1-1'), 100.0)])
+            collector.publish(snapshot.build())
+
+        # Verify that both clusters end up in a single family, told apart by the cluster label
+        families = {family.name: family for family in collector.collect()}
+        samples = families['storm_topology_uptime_seconds'].samples
+        self.assertEqual({sample.labels['cluster'] for sample in samples}, {'prod', 'staging'})
+        self.assertEqual(collector.snapshot('prod').generation, 1)
+
+    def test_load_clusters(self):
+        args = argparse.Namespace(
+            storm_ui_host='localhost:8080', cluster=[], clusters_file=None, refresh_rate=15,
+            max_concurrent_requests=4, component_metrics_topologies='', component_refresh_rate=60)
+
+        # Without clusters the exporter polls --storm-ui-host without a cluster name
+        clusters = storm_exporter.load_clusters(args)
+        self.assertEqual(clusters, [storm_exporter.ClusterConfig('', 'localhost:8080', 15, 4, frozenset(), 60)])
+
+        # Clusters from a file can override the defaults, --cluster adds more
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump([{'name': 'prod', 'storm_ui_host': 'storm-prod:8080', 'refresh_rate': 30,
+                        'component_topologies': ['wordcount']}], f)
+        self.addCleanup(os.remove, f.name)
+        args.clusters_file = f.name
+        args.cluster = ['staging=storm-staging:8080']
+        clusters = storm_exporter.load_clusters(args)
+        self.assertEqual([cluster.name for cluster in clusters], ['prod', 'staging'])
+        self.assertEqual(clusters[0].refresh_rate, 30)
+        self.assertEqual(clusters[0].component_topologies, frozenset(['wordcount']))
+        self.assertEqual(clusters[1].refresh_rate, 15)
+
+        # Duplicated names and malformed flags are rejected
+        args.cluster = ['prod=storm-other:8080']
+        with self.assertRaises(ValueError):
+            storm_exporter.load_clusters(args)
+        args.clusters_file, args.cluster = None, ['storm-other:8080']
+        with self.assertRaises(ValueError):
+            storm_exporter.load_clusters(args)
+
+        # A single unnamed cluster in a file is allowed, anything but a list of objects is rejected
+        with open(f.name, 'w') as clusters_file:
+            json.dump([{'storm_ui_host': 'storm-prod:8080'}], clusters_file)
+        args.clusters_file, args.cluster = f.name, []
+        self.assertEqual([cluster.name for cluster in storm_exporter.load_clusters(args)], [''])
+        with open(f.name, 'w') as clusters_file:
+            json.dump({'name': 'prod', 'storm_ui_host': 'storm-prod:8080'}, clusters_file)
+        with self.assertRaisesRegex(ValueError, 'JSON list'):
+            storm_exporter.load_clusters(args)
+
+        # Setting values are checked, numeric strings are accepted
+        for settings, error in (({'refresh_rate': '30'}, None),
+                                ({'refresh_rate': 'fast'}, 'refresh_rate must be an integer'),
+                                ({'component_refresh_rate': 0}, 'component_refresh_rate must be positive'),
+                                ({'max_concurrent_requests': 2.5}, 'max_concurrent_requests must be an integer'),
+                                ({'component_topologies': 5}, 'component_topologies'),
+                                ({'component_topologies': ['wordcount', 5]}, 'component_topologies')):
+            with open(f.name, 'w') as clusters_file:
+                json.dump([dict({'name': 'prod', 'storm_ui_host': 'storm-prod:8080'}, **settings)], clusters_file)
+            if error is None:
+                self.assertEqual(storm_exporter.load_clusters(args)[0].refresh_rate, 30)
+            else:
+                with self.assertRaisesRegex(ValueError, f"Cluster 'prod': {error}"):
+                    storm_exporter.load_clusters(args)
+
+    def test_configure_http_session(self):
+        # Restore the shared session as it was, so later tests keep its pool size and timeouts
+        session = storm_exporter.HTTP_SESSION
+        self.addCleanup(setattr, storm_exporter, 'HTTP_TIMEOUT', storm_exporter.HTTP_TIMEOUT)
+        self.addCleanup(setattr, session, 'headers', session.headers.copy())
+        self.addCleanup(setattr, session, 'adapters', session.adapters.copy())
+
+        storm_exporter.configure_http_session(8, 2, 10)
+
+        # Verify that the pooled adapter and the split timeouts are in place
+        adapter = storm_exporter.HTTP_SESSION.get_adapter('http://localhost:8080/api/v1/topology/summary')
+        self.addCleanup(adapter.close)
+        self.assertEqual(adapter._pool_maxsize, 8)
+        self.assertEqual(storm_exporter.HTTP_TIMEOUT, (2, 10))
+        self.assertEqual(storm_exporter.HTTP_SESSION.headers['Accept-Encoding'], 'gzip')
+
+    def test_counter_tracker(self):
+        tracker = storm_exporter.CounterTracker()
+        key = ('', 'wordcount-1-1', 'storm_topology_stats_acked', ('wordcount', 'wordcount-1-1'))
+
+        # The first value starts the counter, the rate needs a second refresh
+        self.assertEqual(tracker.update(key, 1000000, now=0), (1000000, None))
+        self.assertEqual(tracker.update(key, 1010000, now=15), (1010000, 10000 / 15))
+
+        # A partial reset, e.g. one worker restarting, moves the baseline without counting anything
+        self.assertEqual(tracker.update(key, 910000, now=30), (1010000, 10000 / 15))
+        self.assertEqual(tracker.update(key, 920000, now=45), (1020000, 10000 / 15))
+
+        # Series no longer exported by the tier are forgotten, others are kept
+        acked = storm_exporter.STORM_TOPOLOGY_STATS_ACKED_TOTAL
+        emitted = storm_exporter.STORM_TOPOLOGY_SPOUTS_EMITTED_TOTAL
+        removed = ('', 'wordcount-1-1', emitted.name, ('wordcount', 'wordcount-1-1', 'removed-spout'))
+        tracker.update(removed, 10, now=45)
+        snapshot = storm_exporter.Snapshot('', 1, {('wordcount-1-1', 'detail'): storm_exporter.SampleGroup(
+            ((acked, ('wordcount', 'wordcount-1-1'), 1020000.0),), 1, 0.0)})
+        tracker.prune(snapshot, storm_exporter.METRICS)
+        self.assertEqual(set(tracker.states), {key})
+
+    def test_derived_counters_replace_window_series(self):
+        storm_exporter.configure_stats_mode('counters')
+        self.addCleanup(storm_exporter.configure_stats_mode, 'windows')
+        topology = {
+            'name': 'wordcount', 'id': 'wordcount-1-1',
+            'topologyStats': [{'window': window, 'acked': 100, 'failed': 1} for window in ('600', '10800', '86400', ':all-time')],
+            'spouts': [{'spoutId': 'spout', 'emitted': 100, 'executors': 2}],
+        }
+        collector = storm_exporter.StormCollector()
+        snapshot = storm_exporter.SnapshotBuilder(collector.snapshot())
+        samples = []
+        storm_exporter.update_topology_metrics(topology, samples)
+        snapshot.add(('wordcount-1-1', 'detail'), storm_exporter.derive_counters(samples))
+        collector.publish(snapshot.build())
+
+        # Window gauges are replaced by one all-time counter, non cumulative metrics are untouched
+        families = {family.name: family for family in collector.collect()}
+        acked = families['storm_topology_stats_acked']
+        self.assertEqual(acked.type, 'counter')
+        self.assertEqual([(sample.name, sample.labels, sample.value) for sample in acked.samples],
+                         [('storm_topology_stats_acked_total', {'topology_name': 'wordcount', 'topology_id': 'wordcount-1-1'}, 100)])
+        self.assertEqual(families['storm_topology_spouts_emitted'].type, 'counter')
+        self.assertEqual(len(families['storm_topology_stats_complete_latency'].samples), 4)
+        self.assertEqual(families['storm_topology_spouts_executors'].samples[0].value, 2)
+        self.assertNotIn('storm_topology_stats_acked_rate', families)
+
+    @patch('storm_exporter.HTTP_SESSION.get')
+    def test_cardinality_filters(self, mock_get):
+        storm_exporter.configure_cardinality(topology_exclude='test-.*', component_include='kafka-spout|count-bolt')
+        self.addCleanup(storm_exporter.configure_cardinality)
+        mock_topologies = [{'name': 'wordcount', 'id': 'wordcount-1-1'}, {'name': 'test-wordcount', 'id': 'test-wordcount-2-1'}]
+
+        mock_response = MagicMock()
+        mock_response.json.return_value = {'topologies': mock_topologies}
+        mock_response.headers = {'Content-Type': 'application/json'}
+        mock_get.return_value = mock_response
+
+        # Excluded topologies are filtered out before their details are requested
+        with patch('storm_exporter.collect_topology_summary_metrics') as mock_collect_metrics:
+            storm_exporter.collect_all_topologies_metrics('localhost')
+            mock_collect_metrics.assert_called_once_with(mock_topologies[0], 'localhost', ANY)
+
+        # Only the included spouts and bolts are exported
+        topology = {'name': 'wordcount', 'id': 'wordcount-1-1',
+                    'spouts': [{'spoutId': 'kafka-spout'}, {'spoutId': 'debug-spout'}],
+                    'bolts': [{'boltId': 'count-bolt'}, {'boltId': 'split-bolt'}]}
+        samples = []
+        storm_exporter.update_topology_metrics(topology, samples)
+        self.assertEqual({labelvalues[2] for _, labelvalues, _ in samples}, {'kafka-spout', 'count-bolt'})
+
+    def test_series_limits(self):
+        storm_exporter.configure_cardinality(drop_topology_id=True)
+        self.addCleanup(storm_exporter.configure_cardinality)
+        collector = storm_exporter.StormCollector()
+        uptime = storm_exporter.STORM_TOPOLOGY_UPTIME_SECONDS
+        capacity = storm_exporter.STORM_TOPOLOGY_BOLTS_CAPACITY
+
+        # The summary is kept first, the detail group is truncated to the remaining budget
+        snapshot = storm_exporter.SnapshotBuilder(collector.snapshot())
+        snapshot.add(('wordcount-1-1', 'summary'), [(uptime, ('wordcount', 'wordcount-1-1'), 100.0)])
+        snapshot.add(('wordcount-1-1', 'detail'), [(capacity, ('wordcount', 'wordcount-1-1', f'bolt_{i}'), 0.5) for i in range(5)])
+        before = storm_exporter.REGISTRY.get_sample_value('storm_exporter_dropped_series_total', {'cluster': '', 'topology_name': 'wordcount'}) or 0
+        collector.publish(snapshot.build(max_series_per_topology=3))
+        dropped = storm_exporter.REGISTRY.get_sample_value('storm_exporter_dropped_series_total', {'cluster': '', 'topology_name': 'wordcount'})
+        self.assertEqual(dropped - before, 3)
+
+        # A redeployed topology is exported once, without its topology_id
+        snapshot = storm_exporter.SnapshotBuilder(collector.snapshot())
+        snapshot.add(('wordcount-2-1', 'summary'), [(uptime, ('wordcount', 'wordcount-2-1'), 10.0)])
+        collector.publish(snapshot.build())
+        families = {family.name: family for family in collector.collect()}
+        self.assertEqual([(sample.labels, sample.value) for sample in families['storm_topology_uptime_seconds'].samples],
+                         [({'topology_name': 'wordcount'}, 10.0)])
+        self.assertEqual(len(families['storm_topology_bolts_capacity'].samples), 2)
+
+    def test_poll_worker_delays_overrunning_cycles(self):
+        worker = storm_exporter.PollWorker('', 'topologies', 10, MagicMock(side_effect=RuntimeError('boom')))
+
+        def counter(name):
+            return storm_exporter.REGISTRY.get_sample_value(name, {'cluster': '', 'tier': 'topologies'}) or 0
+
+        # A failing cycle is logged and does not stop the worker
+        with self.assertLogs(level='ERROR'):
+            self.assertGreater(worker.run_cycle(0), 0)
+
+        # Neither does a failure while scheduling the next cycle
+        with patch.object(worker, 'schedule_next', side_effect=ZeroDivisionError()), self.assertLogs(level='ERROR'):
+            self.assertGreater(worker.run_cycle(0), 0)
+
+        # Refresh rates must be positive
+        with self.assertRaises(ValueError):
+            storm_exporter.PollWorker('', 'topologies', 0, MagicMock())
+        with self.assertRaises(argparse.ArgumentTypeError):
+            storm_exporter.positive_int('0')
+
+        # Cycles within the refresh rate keep the fixed schedule
+        self.assertEqual(worker.schedule_next(0, 5), 10)
+
+        # An overrun starts the next cycle right away, coalescing the start times it missed
+        delayed, skipped = counter('storm_exporter_delayed_cycles_total'), counter('storm_exporter_skipped_cycles_total')
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(worker.schedule_next(0, 15), 15)
+            self.assertEqual(worker.schedule_next(0, 35), 35)
+        self.assertEqual(counter('storm_exporter_delayed_cycles_total') - delayed, 2)
+        self.assertEqual(counter('storm_exporter_skipped_cycles_total') - skipped, 2)
+
+    @patch('storm_exporter.HTTP_SESSION.get')
+    def test_topology_data_timestamp(self, mock_get):
+        topology_summary = {'name': 'wordcount', 'id': 'wordcount-1-1'}
+        capacity = storm_exporter.STORM_TOPOLOGY_BOLTS_CAPACITY
+        previous = storm_exporter.Snapshot('', 1, {('wordcount-1-1', 'detail'): storm_exporter.SampleGroup(
+            ((capacity, ('wordcount', 'wordcount-1-1', 'bolt_1'), 0.5),), 1, 1000.0)})
+
+        # Details that could not be refreshed keep the topology data at their fetch time
+        mock_get.side_effect = requests.exceptions.Timeout()
+        snapshot = storm_exporter.SnapshotBuilder(previous)
+        storm_exporter.collect_topology_summary_metrics(topology_summary, 'localhost', snapshot)
+        summary = {metric.name: value for metric, _, value in snapshot.groups[('wordcount-1-1', 'summary')].samples}
+        self.assertEqual(summary['storm_topology_data_timestamp_seconds'], 1000.0)
+
+        # Once the details are evicted the last timestamp is kept, so the data keeps ageing
+        previous = storm_exporter.Snapshot('', 2, {('wordcount-1-1', 'summary'): snapshot.groups[('wordcount-1-1', 'summary')]})
+        snapshot = storm_exporter.SnapshotBuilder(previous)
+        storm_exporter.collect_topology_summary_metrics(topology_summary, 'localhost', snapshot)
+        summary = {metric.name: value for metric, _, value in snapshot.groups[('wordcount-1-1', 'summary')].samples}
+        self.assertEqual(summary['storm_topology_data_timestamp_seconds'], 1000.0)
+
+        # A topology whose details were never fetched does not look fresh
+        snapshot = storm_exporter.SnapshotBuilder(storm_exporter.Snapshot('', 0, {}))
+        storm_exporter.collect_topology_summary_metrics(topology_summary, 'localhost', snapshot)
+        summary = {metric.name: value for metric, _, value in snapshot.groups[('wordcount-1-1', 'summary')].samples}
+        self.assertNotIn('storm_topology_data_timestamp_seconds', summary)
+
+    def test_fetch_error_type(self):
+        # Read timeouts raised while streaming a body are wrapped in a ConnectionError by requests
+        read_timeout = urllib3.exceptions.ReadTimeoutError(None, '/api/v1/topology/wordcount-1-1', 'Read timed out.')
+        self.assertEqual(storm_exporter.fetch_error_type(requests.exceptions.ConnectionError(read_timeout)), 'timeout')
+        self.assertEqual(storm_exporter.fetch_error_type(requests.exceptions.ReadTimeout()), 'timeout')
+        self.assertEqual(storm_exporter.fetch_error_type(requests.exceptions.ConnectionError('refused')), 'connection')
+        self.assertEqual(storm_exporter.fetch_error_type(storm_exporter.InvalidContentTypeError()), 'content_type')
+        self.assertEqual(storm_exporter.fetch_error_type(ValueError()), 'parse')
 
 if __name__ == '__main__':
     unittest.main()